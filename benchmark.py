@@ -0,0 +1,217 @@
+# benchmarks for the hot paths of the notaicar package: importing it, creating tracks, sensing and driving
+# every benchmark uses the same seeded tracks, so results can be compared between commits
+# results are printed and written to a JSON file, e.g.
+#   python benchmark.py --output bench-before.json
+#   python benchmark.py --output bench-after.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+import notaicar as nac
+
+BENCHMARK_SEEDS = (0, 1, 2, 3, 4)
+# the modules whose import time is measured: the whole package, what a headless worker needs and the on-screen parts
+IMPORT_MODULES = ("notaicar", "notaicar.runners", "notaicar.rendering", "notaicar.game")
+# the stages of Track.Create, in the order they run, and the distance transform it leaves until it's needed
+TRACK_CREATE_STAGES = ("GetNewTrack", "SetScaledTrack", "SetInterpolatedScaledTrack", "SetTrackWidths", "SetTrackPixels", "SetTrackDistances")
+
+def TimeIt(function, repeats):
+    # seconds for each call of function
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def Summarise(timings, per=1):
+    # median and best time in milliseconds. per divides each time, e.g. by the number of frames it covered
+    timings = np.asarray(timings) / per
+    return {"median ms":float(np.median(timings) * 1e3), "min ms":float(timings.min() * 1e3), "runs":len(timings)}
+
+def CreateTrack(seed, **track_size):
+    track = nac.Track(None, None, seed, **track_size)
+    track.Create()
+    return track
+
+def BenchmarkImports(repeats):
+    # how long each module takes to import in a new Python process, which is what every worker process pays when it starts
+    # and whether it pulled in pygame or SciPy, which should only be imported by the parts that need them
+    results = {}
+    for module in IMPORT_MODULES:
+        code = (f"import sys, time; start = time.perf_counter(); import {module}; seconds = time.perf_counter() - start; "
+                "print(seconds, 'pygame' in sys.modules, 'scipy' in sys.modules)")
+        timings = []
+        for _ in range(repeats):
+            # run from next to this script, where the package is, wherever the benchmark was started from
+            output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+            timings.append(float(output[-3]))
+        results[module] = {**Summarise(timings), "imports pygame":output[-2] == "True", "imports scipy":output[-1] == "True"}
+    return results
+
+def BenchmarkTrackCreate(repeats, track_size):
+    # time each stage of Track.Create separately, for every seed
+    stage_timings = {stage:[] for stage in TRACK_CREATE_STAGES}
+    total_timings = []
+    for seed in BENCHMARK_SEEDS:
+        for _ in range(repeats):
+            track = nac.Track(None, None, seed, **track_size)
+            total = 0.0
+            for stage in TRACK_CREATE_STAGES:
+                start = time.perf_counter()
+                getattr(track, stage)()
+                seconds = time.perf_counter() - start
+                stage_timings[stage].append(seconds)
+                total += seconds
+            total_timings.append(total)
+
+    results = {stage:Summarise(timings) for stage, timings in stage_timings.items()}
+    results["total"] = Summarise(total_timings)
+    return results
+
+def BenchmarkTrackCache(repeats, track_size, directory):
+    # time loading a track from the cache compared with generating it
+    cache = nac.TrackCache(directory)
+    for seed in BENCHMARK_SEEDS:
+        nac.Track(None, None, seed, **track_size).Create(cache)
+    timings = []
+    for seed in BENCHMARK_SEEDS:
+        timings += TimeIt(lambda: cache.Load(nac.Track(None, None, seed, **track_size)), repeats)
+    return {"Load":Summarise(timings)}
+
+def BenchmarkSensing(repeats, tracks, fleet_size):
+    # the cost of one frame of sensing, for one car and for a whole fleet
+    car_timings = []
+    cast_rays_timings = []
+    sphere_traced_timings = []
+    for track in tracks:
+        # the distance transform is only made the first time it's needed, and SetTrackDistances is already timed in BenchmarkTrackCreate
+        track.GetTrackDistances()
+        car = nac.Car(None, track)
+        car_timings += TimeIt(lambda: car.GetTrackEdgeDistances(False), repeats)
+
+        # a fleet spread out along the track, so the rays see different amounts of track
+        centre_line = track.interpolated_scaled_track
+        positions = np.rint(centre_line[np.linspace(0, len(centre_line) - 1, fleet_size).astype(int)])
+        directions = np.random.default_rng(0).uniform(-np.pi, np.pi, fleet_size)
+        cast_rays_timings += TimeIt(lambda: nac.CastRays(track.track_pixels, positions, directions), max(1, repeats // 10))
+        sphere_traced_timings += TimeIt(lambda: nac.CastRaysSphereTraced(track.GetTrackDistances(), positions, directions), max(1, repeats // 10))
+
+    return {
+        "Car.GetTrackEdgeDistances":Summarise(car_timings),
+        f"CastRays {fleet_size} cars":Summarise(cast_rays_timings),
+        f"CastRaysSphereTraced {fleet_size} cars":Summarise(sphere_traced_timings),
+        }
+
+def BenchmarkDriving(tracks, max_frames, fleet_size):
+    # whole headless laps: frames per second for one car and car-frames per second for a fleet
+    frames = 0
+    seconds = 0.0
+    drive_timings = []
+    for track in tracks:
+        start = time.perf_counter()
+        car, _ = nac.DriveLap(track, max_frames)
+        seconds += time.perf_counter() - start
+        frames += car.statsInfo["frames"]
+
+        car = nac.Car(None, track)
+        drive_timings += TimeIt(car.Drive, 200)
+
+    fleet_frames = 0
+    fleet_seconds = 0.0
+    for track in tracks:
+        fleet = nac.Fleet(track, fleet_size)
+        start = time.perf_counter()
+        for _ in range(200):
+            fleet_frames += fleet.Step()
+        fleet_seconds += time.perf_counter() - start
+
+    return {
+        "Car.Drive":Summarise(drive_timings),
+        "DriveLap frames/second":frames / seconds,
+        f"Fleet {fleet_size} cars car-frames/second":fleet_frames / fleet_seconds,
+        }
+
+def BenchmarkMemory(track_size):
+    # bytes held by each array of a track, and the most memory used while creating one
+    tracemalloc.start()
+    track = CreateTrack(BENCHMARK_SEEDS[0], **track_size)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "track_pixels bytes":track.track_pixels.nbytes,
+        "packed track_pixels bytes":track.GetPackedTrackPixels().nbytes,
+        "track_distances bytes":track.GetTrackDistances().nbytes,
+        "interpolated_scaled_track bytes":track.interpolated_scaled_track.nbytes,
+        "track_widths bytes":track.track_widths.nbytes,
+        "Track.Create peak bytes":peak_bytes,
+        }
+
+def GetEnvironment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit":commit,
+        "time":time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python":platform.python_version(),
+        "numpy":np.__version__,
+        "machine":platform.machine(),
+        "processor":platform.processor(),
+        }
+
+def RunBenchmarks(repeats, max_frames, fleet_size, track_size, cache_directory):
+    tracks = [CreateTrack(seed, **track_size) for seed in BENCHMARK_SEEDS]
+    results = {
+        "environment":GetEnvironment(),
+        "settings":{"seeds":list(BENCHMARK_SEEDS), "repeats":repeats, "max frames":max_frames, "fleet size":fleet_size, **track_size},
+        "imports":BenchmarkImports(repeats),
+        "Track.Create":BenchmarkTrackCreate(repeats, track_size),
+        "sensing":BenchmarkSensing(repeats * 10, tracks, fleet_size),
+        "driving":BenchmarkDriving(tracks, max_frames, fleet_size),
+        "memory":BenchmarkMemory(track_size),
+        }
+    if cache_directory:
+        results["TrackCache"] = BenchmarkTrackCache(repeats, track_size, cache_directory)
+    return results
+
+def PrintResults(results, indent=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            if "median ms" in value:
+                print(f"{indent}{key}: {value['median ms']:.3f} ms (min {value['min ms']:.3f} ms)")
+            else:
+                print(f"{indent}{key}:")
+                PrintResults(value, indent + "  ")
+        elif isinstance(value, float):
+            print(f"{indent}{key}: {value:.1f}")
+        else:
+            print(f"{indent}{key}: {value}")
+
+def ParseArguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark importing, track creation, sensing and driving")
+    parser.add_argument("--output", default="benchmark.json", help="write the results to this JSON file")
+    parser.add_argument("--repeats", type=int, default=5, help="how many times each timing is repeated")
+    parser.add_argument("--max-frames", type=int, default=3000, help="frame limit for each headless lap")
+    parser.add_argument("--fleet-size", type=int, default=1000, help="number of cars in fleet benchmarks")
+    parser.add_argument("--rows", type=int, default=nac.ROWS)
+    parser.add_argument("--cols", type=int, default=nac.COLS)
+    parser.add_argument("--square-size", type=int, default=nac.SQUARE_SIZE)
+    parser.add_argument("--cache-dir", help="also benchmark loading tracks from a track cache in this directory")
+    return parser.parse_args(argv)
+
+if __name__=="__main__":
+    arguments = ParseArguments()
+    track_size = {"rows":arguments.rows, "cols":arguments.cols, "square_size":arguments.square_size}
+    results = RunBenchmarks(arguments.repeats, arguments.max_frames, arguments.fleet_size, track_size, arguments.cache_dir)
+    PrintResults(results)
+    with open(arguments.output, "w") as output_file:
+        json.dump(results, output_file, indent=1)
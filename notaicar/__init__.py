@@ -0,0 +1,34 @@
+# Not-AI-Car: a car driving itself round randomly generated tracks
+# the parts that run without a display (tracks, sensing, driving, telemetry and the headless runners) only need NumPy to import,
+# and SciPy when they first use it. The parts that draw on the screen import pygame, so they're only imported when they're used
+from .constants import *
+from .sensing import CastRays, CastRaysSphereTraced, GetCarFootprint, GetFootprintHeading
+from .track import GetCircleStencil, RasteriseTrack, PackedTrackPixels, GetWindowSize, Track, LapCounter, TrackCache
+from .physics import Controller, RuleController, CarConfig, InstructionHistory, Car, Fleet
+from .telemetry import EncodeTelemetryHeader, GetTelemetryPath, GetTelemetryHeader, TelemetryRecorder, TelemetryFile
+from .profiling import FrameProfiler
+from .runners import (RunHeadless, DriveLap, EvaluateTrack, EvaluateTracks, SummariseEvaluation, RunEvaluation,
+                      GetParameterGrid, GetRandomParameters, EvaluateSweepTrack, EvaluateFleet, SweepControllers, RunSweep)
+
+# the module each on-screen name (and the server, which needs asyncio) is in, imported the first time the name is used
+LAZY_NAMES = {
+    "GetCarSprites":"rendering",
+    "CarIcon":"rendering",
+    "GetFont":"rendering",
+    "StatsPanel":"rendering",
+    "Renderer":"rendering",
+    "main":"game",
+    "ReplayCar":"replay",
+    "ReplayViewer":"replay",
+    "EvaluationServer":"server",
+    "RunServer":"server",
+    "RequestEvaluation":"server",
+    "ParseArguments":"cli",
+    "Main":"cli",
+    }
+
+def __getattr__(name):
+    if name not in LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    return getattr(importlib.import_module(f".{LAZY_NAMES[name]}", __name__), name)
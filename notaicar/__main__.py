@@ -0,0 +1,4 @@
+# python -m notaicar runs Not-AI-Car, the same on every platform
+from .cli import Main
+
+Main()
@@ -0,0 +1,104 @@
+# the command line, see Main
+# the on-screen parts are only imported when they're used, so headless runs never import pygame
+import argparse
+from .constants import *
+from .profiling import FrameProfiler
+from .runners import GetParameterGrid, GetRandomParameters, RunEvaluation, RunHeadless, RunSweep
+from .track import TrackCache
+
+def ParseArguments(argv=None):
+    parser = argparse.ArgumentParser(description="Not-AI-Car")
+    parser.add_argument("--headless", action="store_true", help="simulate without a display, as fast as the CPU allows")
+    parser.add_argument("--tracks", type=int, default=10, help="number of tracks to drive in headless mode")
+    parser.add_argument("--max-frames", type=int, default=10000, help="stop driving a track in headless mode after this many frames")
+    parser.add_argument("--cars", type=int, default=1, help="number of cars to drive each track at once in headless mode")
+    parser.add_argument("--evaluate", type=int, metavar="TRACKS", help="drive a lap of this many seeded tracks in parallel and report the stats")
+    parser.add_argument("--first-seed", type=int, help="seed of the first track. The rest follow on from it (default: random, or 0 when evaluating)")
+    parser.add_argument("--workers", type=int, help="number of worker processes used to evaluate tracks (default: one per CPU)")
+    parser.add_argument("--output", help="write the per-track evaluation results to this JSON file")
+    parser.add_argument("--sweep", choices=("grid", "random"), help="evaluate lots of controller parameters on --tracks seeded tracks in parallel, either every combination of them or random ones")
+    parser.add_argument("--sweep-parameter", nargs="+", action="append", metavar=("NAME", "VALUE"),
+                        help=f"values of a controller parameter to sweep, one of {', '.join(CONTROLLER_PARAMETERS)}. Random sweeps pick between the smallest and largest")
+    parser.add_argument("--sweep-samples", type=int, default=100, help="number of parameter sets a random sweep tries")
+    parser.add_argument("--record", metavar="DIRECTORY", help="in headless mode, save every frame of every car to a telemetry file for each track in this directory")
+    parser.add_argument("--replay", metavar="FILE", help="replay a telemetry file saved with --record")
+    parser.add_argument("--replay-frame", type=int, default=0, help="frame to start the replay at")
+    parser.add_argument("--serve", action="store_true", help="run a server that evaluates jobs sent to it as lines of JSON, see notaicar/server.py")
+    parser.add_argument("--host", default=SERVER_HOST, help="address the server listens on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="port the server listens on")
+    parser.add_argument("--server-warm", type=int, default=0, metavar="TRACKS", help="make this many seeded tracks, from --first-seed, before the server starts listening")
+    parser.add_argument("--server-queue", type=int, default=SERVER_QUEUE_SIZE, help="how many tracks can wait for each server worker before the server stops reading jobs")
+    parser.add_argument("--server-tracks", type=int, default=SERVER_WORKER_TRACKS, help="how many tracks each server worker keeps in memory")
+    parser.add_argument("--rows", type=int, default=ROWS, help="number of rows of squares in the grid the track is made on")
+    parser.add_argument("--cols", type=int, default=COLS, help="number of columns of squares in the grid the track is made on")
+    parser.add_argument("--square-size", type=int, default=SQUARE_SIZE, help="size of each grid square in pixels")
+    parser.add_argument("--profile", action="store_true", help="time each part of every frame and show the percentiles")
+    parser.add_argument("--profile-output", help="save the time of each part of every frame to this .csv or .json file")
+    parser.add_argument("--render", choices=("dirty", "full"), default="dirty", help="only redraw the parts of the screen that change, or redraw it all every frame")
+    parser.add_argument("--fast-forward", type=int, choices=FAST_FORWARD_LEVELS, default=1, help="on screen, how many times faster than normal to drive")
+    parser.add_argument("--steps-per-second", type=int, default=SIMULATION_STEPS_PER_SECOND, help="on screen, how many steps a second the car is driven at x1")
+    parser.add_argument("--fps", type=int, default=DISPLAY_FRAMES_PER_SECOND, help="on screen, how many times a second the screen is drawn")
+    parser.add_argument("--collision", choices=COLLISION_MODES, default="point", help="crash when the middle of the car leaves the track, or when any part of it does")
+    parser.add_argument("--car-size", type=int, nargs=2, metavar=("LENGTH", "WIDTH"), default=(CAR_LENGTH, CAR_WIDTH), help="how big the car is drawn in pixels, and what has to stay on the track with --collision footprint")
+    parser.add_argument("--cache-dir", help="save generated tracks in this directory and load them from it next time")
+    parser.add_argument("--cache-size-mb", type=float, default=TRACK_CACHE_MAX_BYTES / (1024 * 1024), help="delete the least recently used cached tracks above this size")
+    arguments = parser.parse_args(argv)
+
+    # turn NAME VALUE VALUE... into {NAME:[VALUE, VALUE...]}
+    arguments.sweep_parameters = {}
+    for name, *values in arguments.sweep_parameter or []:
+        if name not in CONTROLLER_PARAMETERS:
+            parser.error(f"unknown controller parameter {name}, choose from {', '.join(CONTROLLER_PARAMETERS)}")
+        if not values:
+            parser.error(f"{name} needs at least one value")
+        try:
+            arguments.sweep_parameters[name] = [float(value) for value in values]
+        except ValueError:
+            parser.error(f"the values of {name} have to be numbers")
+    if arguments.evaluate is not None and arguments.evaluate < 1:
+        parser.error("--evaluate needs at least 1 track")
+    if arguments.sweep and not arguments.sweep_parameters:
+        parser.error("--sweep needs at least one --sweep-parameter")
+    if arguments.rows < TRACK_GRID_MIN or arguments.cols < TRACK_GRID_MIN:
+        parser.error(f"--rows and --cols need to be at least {TRACK_GRID_MIN}")
+    if arguments.cars < 1:
+        parser.error("--cars needs at least 1 car")
+    if arguments.tracks < 1:
+        parser.error("--tracks needs at least 1 track")
+    if arguments.sweep_samples < 1:
+        parser.error("--sweep-samples needs at least 1 sample")
+    return arguments
+
+def Main(argv=None):
+    arguments = ParseArguments(argv)
+    cache = None
+    if arguments.cache_dir:
+        cache = TrackCache(arguments.cache_dir, round(arguments.cache_size_mb * 1024 * 1024))
+    track_size = {"rows":arguments.rows, "cols":arguments.cols, "square_size":arguments.square_size}
+    profiler = FrameProfiler(arguments.profile or arguments.profile_output is not None, arguments.profile_output)
+    if arguments.replay:
+        from .replay import ReplayViewer
+        ReplayViewer(arguments.replay, cache).Run(arguments.replay_frame)
+    elif arguments.serve:
+        from .server import RunServer
+        first_seed = arguments.first_seed or 0
+        RunServer(arguments.host, arguments.port, arguments.workers, cache, track_size, arguments.max_frames, arguments.collision, arguments.car_size,
+                  range(first_seed, first_seed + arguments.server_warm), arguments.server_queue, arguments.server_tracks)
+    elif arguments.sweep:
+        first_seed = arguments.first_seed or 0
+        if arguments.sweep == "grid":
+            parameter_sets = GetParameterGrid(arguments.sweep_parameters)
+        else:
+            parameter_sets = GetRandomParameters(arguments.sweep_parameters, arguments.sweep_samples, first_seed)
+        RunSweep(parameter_sets, range(first_seed, first_seed + arguments.tracks), arguments.max_frames, arguments.workers, arguments.output, cache, track_size, arguments.collision, arguments.car_size)
+    elif arguments.evaluate is not None:
+        first_seed = arguments.first_seed or 0
+        RunEvaluation(range(first_seed, first_seed + arguments.evaluate), arguments.max_frames, arguments.workers, arguments.output, cache, track_size, arguments.collision, arguments.car_size)
+    elif arguments.headless:
+        RunHeadless(arguments.tracks, arguments.max_frames, arguments.cars, arguments.first_seed, cache, track_size, profiler, arguments.collision, arguments.car_size,
+                    arguments.record)
+    else:
+        # call the main function
+        from .game import main
+        main(arguments.first_seed, cache, track_size, profiler, arguments.render == "dirty", arguments.collision, arguments.car_size,
+             arguments.fast_forward, arguments.steps_per_second, arguments.fps)
@@ -0,0 +1,124 @@
+# the settings shared by every part of Not-AI-Car
+# only NumPy is needed, so this is quick to import
+import math
+import os
+import numpy as np
+
+BLACK = (0, 0, 0)
+WHITE = (200, 200, 200)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+START_COLOUR = (200, 200, 0)
+SQUARE_SIZE = 130
+ROWS = 6
+COLS = 10
+# the track starts as a square in from the edge of the grid, so the grid needs at least this many rows and columns
+TRACK_GRID_MIN = 3
+TRACK_MIN_WIDTH = 15
+TRACK_MAX_WIDTH = 42
+# make the track end the same width as it starts, see Track.SetTrackWidths
+TRACK_PERIODIC_WIDTHS = False
+TRACK_MIDLINE_COLOUR = WHITE
+
+# cars can only look so far ahead. Needs to be somewhat larger than the maximum track width - try seting that distance to the size of a grid square
+CAR_VISION_DISTANCE = round(3.0 * SQUARE_SIZE)
+#CAR_VISION_ANGLES = (0, -10, 10, -20, 20, -30, 30, -45, 45, -60, 60, -80, 80, -90, 90) # 0 must be first
+CAR_VISION_ANGLES = (0, -20, 20, -45, 45, -60, 60, -90, 90) # 0 must be first
+CAR_VISION_ANGLES = (0, -20, 20, -45, 45, -60, 60) # 0 must be first
+CAR_SPEED_MIN_INITIAL = 4 # pixels per frame
+CAR_SPEED_MAX_INITIAL = 15 # pixels per frame
+CAR_ACCELERATION_MIN = -6 # change in speed in pixels per frame
+CAR_ACCELERATION_MAX = 5 # change in speed in pixels per frame
+CAR_STEERING_RADIANS_MAX = math.radians(30)
+CAR_STEERING_RADIANS_DELTA_MAX = math.radians(45)
+# the constants of RuleController, which can be changed to try other driving styles. See RunSweep
+CONTROLLER_PARAMETERS = {
+    "speed_gain":4, # how much the car speeds up when the road ahead is clear
+    "speed_offset":2, # how much it slows down when it isn't
+    "steering_gain":5, # how hard it steers away from the nearer edge of the track
+    "steering_threshold":1.8, # it only steers once the road ahead is clear for less than CAR_VISION_DISTANCE / steering_threshold
+    }
+# how many of a car's latest instructions are kept, see InstructionHistory
+CAR_INSTRUCTION_HISTORY = 20
+# one instruction, as a row of InstructionHistory
+INSTRUCTION_DTYPE = np.dtype([
+    ("speed", np.float64),
+    ("speed_delta", np.float64),
+    ("direction_radians", np.float64),
+    ("steering_radians", np.float64),
+    ("track_edge_distances", np.float64, (len(CAR_VISION_ANGLES),)),
+    ])
+# change the version whenever the way tracks are generated changes, so old cached tracks aren't used
+TRACK_CACHE_VERSION = 3
+TRACK_CACHE_MAX_BYTES = 500 * 1024 * 1024
+# telemetry files start with TELEMETRY_MAGIC, then the length of a JSON header and the header, padded so the frames start
+# on a multiple of TELEMETRY_ALIGNMENT bytes. Then every frame follows, with one TELEMETRY_DTYPE record per car. See TelemetryRecorder
+TELEMETRY_MAGIC = b"NOTAICAR"
+TELEMETRY_VERSION = 1
+TELEMETRY_ALIGNMENT = 64
+TELEMETRY_CHUNK_FRAMES = 256
+TELEMETRY_DTYPE = np.dtype([
+    ("position", "<f4", (2,)),
+    ("speed", "<f4"),
+    ("direction_radians", "<f4"),
+    ("steering_radians", "<f4"),
+    ("track_edge_distances", "<u2", (len(CAR_VISION_ANGLES),)),
+    ("crashed", "?"),
+    ])
+# on screen, the cars are driven SIMULATION_STEPS_PER_SECOND steps a second, times the fast forward, whatever the display's frame rate
+# 200 is what the frame rate used to be capped at, so x1 drives at the same speed as before
+SIMULATION_STEPS_PER_SECOND = 200
+DISPLAY_FRAMES_PER_SECOND = 60
+FAST_FORWARD_LEVELS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# the fraction of each displayed frame that can be spent driving. Steps that don't fit are dropped, so the display keeps up
+SIMULATION_FRAME_BUDGET = 0.8
+# how much time a slow frame (e.g. making a new track) can catch up on, in seconds
+SIMULATION_MAX_CATCH_UP = 0.25
+# the parts of a frame that are timed by FrameProfiler, and how many frames the percentiles cover
+PROFILER_SECTIONS = ("events", "sensing", "steering", "rendering", "flip", "tick")
+PROFILER_WINDOW_FRAMES = 600
+PROFILER_PERCENTILE_FRAMES = 30
+# with an output file, frames are written to it this many at a time, so a long run doesn't keep them all in memory
+PROFILER_OUTPUT_CHUNK_FRAMES = 1000
+CAR_PATH_COLOUR = RED
+CAR_COLOUR = GREEN
+
+# every vision ray is sampled at the same distances, so work these out once
+CAR_VISION_ANGLES_RADIANS = np.radians(CAR_VISION_ANGLES)
+CAR_VISION_STEPS = np.arange(1, CAR_VISION_DISTANCE)
+CAR_VISION_SIDE_ANGLES = np.array(CAR_VISION_ANGLES[1:])
+# once this few rays are left, sphere tracing stops and tests the rest of each unfinished ray one step at a time
+SPHERE_TRACE_MIN_RAYS = 64
+
+# how many points of a track's centre line either side of where a car was that LapCounter searches for where it is now
+LAP_COUNTER_SEARCH_OFFSETS = np.arange(-40, 41)
+
+# the size of the car images, and the default size of the part of a car that has to stay on the track in "footprint" collision mode
+# the start of a track can be narrower than this, so cars can be made smaller, see Car
+CAR_LENGTH = 76
+CAR_WIDTH = 38
+# how many headings the car's footprint is worked out for, over half a turn (a rectangle looks the same the other way round)
+CAR_FOOTPRINT_HEADINGS = 16
+# "point": a car has crashed when the pixel it's on isn't track. "footprint": when any of it is off the track
+COLLISION_MODES = ("point", "footprint")
+
+# the images are next to the notaicar package, so they're found wherever it's run from
+ASSETS_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGO_IMAGE = os.path.join(ASSETS_DIRECTORY, "logo32x32.png")
+# the car images and how finely they are rotated, see GetCarSprites
+CAR_IMAGE = os.path.join(ASSETS_DIRECTORY, "images", "green-car.png")
+CAR_IMAGES = tuple(os.path.join(ASSETS_DIRECTORY, "images", f"{colour}-car.png") for colour in ("green", "red", "purple", "white", "grey"))
+CAR_SPRITE_ANGLE_RESOLUTION = 2 # degrees
+
+# the evaluation server, see EvaluationServer. It only listens on this computer unless it's given another host
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+# how many tracks can be waiting for each worker process before the server stops reading new jobs
+SERVER_QUEUE_SIZE = 16
+# how many tracks each worker process keeps in memory, dropping the least recently used
+# each takes about 5 MB for its pixels and distances at the default size, and 16 MB more for its footprints with --collision footprint
+SERVER_WORKER_TRACKS = 32
+# the most frames a job can ask for
+SERVER_MAX_FRAMES = 100000
+# the longest line, i.e. job or reply, the server and RequestEvaluation will read
+SERVER_MAX_LINE_BYTES = 16 * 1024 * 1024
@@ -0,0 +1,145 @@
+# driving a car round tracks on screen, see main
+import sys
+import time
+import pygame
+from .constants import *
+from .physics import Car
+from .profiling import FrameProfiler
+from .rendering import Renderer, StatsPanel
+from .track import GetWindowSize, Track
+
+# define a main function
+def main(first_seed=None, cache=None, track_size=None, profiler=None, dirty_rects=True, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH),
+         fast_forward=1, steps_per_second=SIMULATION_STEPS_PER_SECOND, display_fps=DISPLAY_FRAMES_PER_SECOND):
+    # initialize the pygame module
+    pygame.init()
+    clock = pygame.time.Clock()
+    # load and set the logo
+    logo = pygame.image.load(LOGO_IMAGE)
+    pygame.display.set_icon(logo)
+    pygame.display.set_caption("AI car")
+    
+    # track_size can set the rows, cols and square_size of the track grid
+    track_size = track_size or {}
+    window = GetWindowSize(**track_size)
+     
+    # create a surface on screen that is the size of the track grid
+    screen = pygame.display.set_mode(window)
+    background = pygame.Surface(window)
+    statsPanel = StatsPanel()
+    renderer = Renderer(screen, background, dirty_rects)
+    if profiler is not None and profiler.enabled:
+        renderer.profiler = profiler
+    
+    # define a variable to control the main loop
+    running = True
+    paused = False
+    newTrackAndCarNeeded = True
+    # with a first seed, each new track has the next seed. Otherwise every track is random
+    track_seed = first_seed
+    profiler = profiler or FrameProfiler()
+    # the car is driven in fixed steps, however often the screen is drawn: every frame adds the steps that are due to the accumulator
+    # and drives that many whole steps. What's left over says how far between its last two steps to draw the car
+    accumulator = 0.0
+    steps = 0
+    last_frame_time = time.perf_counter()
+
+    # main loop
+    while running:
+        if newTrackAndCarNeeded:
+            # create the track and draw it on the background. The car starts with the initial speed limits
+            track = Track(window, background, track_seed, **track_size)
+            track.Create(cache)
+            if track_seed is not None:
+                track_seed += 1
+            car = Car(background, track, collision, car_size)
+            if profiler.enabled:
+                car.profiler = profiler
+            previous_position = car.position
+            previous_direction_radians = car.direction_radians
+            accumulator = 0.0
+            # making the track isn't time the car should catch up on
+            last_frame_time = time.perf_counter()
+            renderer.Reset()
+            newTrackAndCarNeeded = False
+
+        profiler.StartFrame()
+        # event handling, gets all event from the event queue
+        for event in pygame.event.get():
+            # only do something if the event is of type QUIT
+            if event.type == pygame.QUIT:
+                # change the value to False, to exit the main loop
+                running = False
+                profiler.Save()
+                pygame.quit
+                sys.exit()
+                break
+            
+            #if event.type == pygame.MOUSEBUTTONDOWN:
+            #    # get the mouse position
+            #    mouse_pos = pygame.mouse.get_pos()
+            #    car.position = mouse_pos
+            #    car.GetTrackEdgeDistances(True)
+            #    continue
+
+            # for the next bit, on windows, you need to:
+            # pip install windows-curses
+            # https://stackoverflow.com/questions/35850362/importerror-no-module-named-curses-when-trying-to-import-blessings
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_n:
+                    newTrackAndCarNeeded = True
+                    continue
+                elif event.key == pygame.K_ESCAPE:
+                    running = False
+                    profiler.Save()
+                    pygame.quit
+                    sys.exit()
+                    break
+                elif event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    car.SetSpeedLimits(car.config.speed_min + 1, car.config.speed_max + 1)
+                elif event.key == pygame.K_LEFT:
+                    car.SetSpeedLimits(car.config.speed_min - 1, car.config.speed_max - 1)
+                elif event.key == pygame.K_UP:
+                    fast_forward = next((level for level in FAST_FORWARD_LEVELS if level > fast_forward), fast_forward)
+                elif event.key == pygame.K_DOWN:
+                    fast_forward = next((level for level in reversed(FAST_FORWARD_LEVELS) if level < fast_forward), fast_forward)
+        
+        profiler.Mark("events")
+
+        now = time.perf_counter()
+        if not paused and not car.crashed:
+            accumulator += min(now - last_frame_time, SIMULATION_MAX_CATCH_UP) * steps_per_second * fast_forward
+        last_frame_time = now
+
+        # drive the steps that are due, unless they'd take longer than the frame has
+        deadline = now + SIMULATION_FRAME_BUDGET / display_fps
+        steps = 0
+        while accumulator >= 1 and not car.crashed:
+            previous_position = car.position
+            previous_direction_radians = car.direction_radians
+            car.Move()
+            if not car.crashed:
+                car.DrawPath()
+            accumulator -= 1
+            steps += 1
+            if steps % 16 == 0 and time.perf_counter() > deadline:
+                accumulator %= 1
+        if car.crashed:
+            accumulator = 0.0
+
+        # draw the car the fraction of a step that is left over past its last position, so it moves smoothly
+        # when there's less than a step per frame
+        if not car.crashed:
+            fraction = accumulator
+            pos_x = previous_position[0] + fraction * (car.position[0] - previous_position[0])
+            pos_y = previous_position[1] + fraction * (car.position[1] - previous_position[1])
+            direction_radians = previous_direction_radians + fraction * (car.direction_radians - previous_direction_radians)
+            car.UpdateIcon(round(pos_x), round(pos_y), direction_radians)
+        statsPanel.Update({**car.statsInfo, "fast forward":fast_forward, "steps per frame":steps}, profiler)
+        
+        renderer.Draw([car], statsPanel)
+        clock.tick(display_fps)
+        profiler.Mark("tick")
+        profiler.EndFrame()
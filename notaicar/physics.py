@@ -0,0 +1,413 @@
+# driving: how cars decide what to do, and how one car or a whole fleet of them moves round a track
+# pygame is only imported for cars that are drawn on a screen
+import math
+import numpy as np
+from .constants import *
+from .sensing import CastRays, CastRaysSphereTraced, GetFootprintHeading
+from .track import LapCounter
+
+class Controller():
+    # decides how a car drives, from how far it is to the edge of the track along each of CAR_VISION_ANGLES
+    # Decide is for one car and returns (speed_delta, steering_radians). Car and Fleet keep these within the car's limits
+    # DecideBatch is for lots of cars at once: edge_distances has a row for each car and it returns an array of each
+    # cars are the indices of the cars the rows are for, so each car can have its own parameters
+    def Decide(self, edge_distances):
+        raise NotImplementedError
+
+    def DecideBatch(self, edge_distances, cars=None):
+        # one car at a time, for controllers that can't do them all at once
+        decisions = [self.Decide(car_edge_distances) for car_edge_distances in edge_distances.tolist()]
+        speed_deltas, steering_radians = zip(*decisions) if decisions else ((), ())
+        return np.array(speed_deltas, dtype=float), np.array(steering_radians, dtype=float)
+
+class RuleController(Controller):
+    # the original driving rules: speed up when the road ahead is clear and steer towards whichever side has more room
+    # each parameter is one of CONTROLLER_PARAMETERS, either one value for every car or an array with a value for each car
+    def __init__(self, **parameters):
+        for name in parameters:
+            if name not in CONTROLLER_PARAMETERS:
+                raise ValueError(f"unknown controller parameter {name}")
+        self.parameters = {**CONTROLLER_PARAMETERS, **parameters}
+
+    @classmethod
+    def FromParameterSets(cls, parameter_sets):
+        # one controller for a Fleet, where car i uses parameter_sets[i]
+        return cls(**{name:np.array([parameter_set.get(name, default) for parameter_set in parameter_sets], dtype=float)
+                      for name, default in CONTROLLER_PARAMETERS.items()})
+
+    def Decide(self, edge_distances):
+        parameters = self.parameters
+        # get the change in speed, based on how clear the road is straight ahead
+        distance_ahead = edge_distances[0] # how far is clear straight ahead
+        speed_delta = parameters["speed_gain"] * (distance_ahead/CAR_VISION_DISTANCE) - parameters["speed_offset"]
+
+        steering_angle_new = 0
+        max_track_distance = 1
+        if distance_ahead < CAR_VISION_DISTANCE / parameters["steering_threshold"]:
+            # angle 0 is always first and is left out of the steering
+            for vision_angle, edge_distance in zip(CAR_VISION_SIDE_ANGLES.tolist(), edge_distances[1:]):
+                steering_angle_new += edge_distance / vision_angle
+                if edge_distance > max_track_distance: max_track_distance = edge_distance
+
+        return speed_delta, parameters["steering_gain"] * steering_angle_new / max_track_distance
+
+    def DecideBatch(self, edge_distances, cars=None):
+        # parameters with a value for each car are narrowed down to the cars being decided for
+        parameters = {name:value[cars] if np.ndim(value) and cars is not None else value for name, value in self.parameters.items()}
+        distance_ahead = edge_distances[:, 0]
+        speed_delta = parameters["speed_gain"] * (distance_ahead/CAR_VISION_DISTANCE) - parameters["speed_offset"]
+
+        side_distances = edge_distances[:, 1:]
+        steering = distance_ahead < CAR_VISION_DISTANCE / parameters["steering_threshold"]
+        steering_angle_new = np.where(steering, (side_distances / CAR_VISION_SIDE_ANGLES).sum(axis=1), 0)
+        max_track_distance = np.where(steering, np.maximum(side_distances.max(axis=1), 1), 1)
+        return speed_delta, parameters["steering_gain"] * steering_angle_new / max_track_distance
+
+class CarConfig():
+    # the limits of one car. Every car has its own, so cars with different limits can drive at the same time
+    __slots__ = ("speed_min", "speed_max", "acceleration_min", "acceleration_max", "steering_radians_max", "steering_radians_delta_max")
+
+    def __init__(self, speed_min=CAR_SPEED_MIN_INITIAL, speed_max=CAR_SPEED_MAX_INITIAL, acceleration_min=CAR_ACCELERATION_MIN, acceleration_max=CAR_ACCELERATION_MAX,
+                 steering_radians_max=CAR_STEERING_RADIANS_MAX, steering_radians_delta_max=CAR_STEERING_RADIANS_DELTA_MAX):
+        self.speed_min = speed_min # pixels per frame
+        self.speed_max = speed_max # pixels per frame
+        self.acceleration_min = acceleration_min # change in speed in pixels per frame
+        self.acceleration_max = acceleration_max # change in speed in pixels per frame
+        self.steering_radians_max = steering_radians_max
+        self.steering_radians_delta_max = steering_radians_delta_max # change in steering per frame
+
+class InstructionHistory():
+    # a car's latest instructions, newest last, in a ring buffer made once so adding an instruction every frame doesn't allocate anything
+    __slots__ = ("buffer", "count", "next")
+
+    def __init__(self, size=CAR_INSTRUCTION_HISTORY):
+        self.buffer = np.zeros(size, dtype=INSTRUCTION_DTYPE)
+        self.count = 0
+        self.next = 0
+
+    def __len__(self):
+        return self.count
+
+    def Append(self, speed, speed_delta, direction_radians, steering_radians, track_edge_distances):
+        instruction = self.buffer[self.next]
+        instruction["speed"] = speed
+        instruction["speed_delta"] = speed_delta
+        instruction["direction_radians"] = direction_radians
+        instruction["steering_radians"] = steering_radians
+        instruction["track_edge_distances"] = track_edge_distances
+        self.next = (self.next + 1) % len(self.buffer)
+        self.count = min(self.count + 1, len(self.buffer))
+
+    def GetLatest(self):
+        # a copy of the instructions, newest first
+        return self.buffer[(self.next - 1 - np.arange(self.count)) % len(self.buffer)]
+
+    def GetNewest(self):
+        # the last instruction added, or None if there aren't any
+        return self.buffer[self.next - 1] if self.count else None
+
+class Car():
+    def __init__(self, screen, track, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH), controller=None, config=None):
+        self.screen = screen
+        self.track = track
+        # see COLLISION_MODES. car_size is (length, width) in pixels, which is how big the car is drawn too
+        self.collision = collision
+        self.car_size = tuple(car_size)
+        # what decides how the car drives, see Controller, and the limits it has to drive within
+        self.controller = controller or RuleController()
+        self.config = config or CarConfig()
+
+        #if isinstance(position, tuple):
+        #    if isinstance(position[0], int) and isinstance(position[1], int):
+        #        self.position = (int(position[0]),int(position[1]))
+        #    else:            
+        #        raise (TypeError, "expected a tuple of integers")
+        #else:
+        #    raise (TypeError, "expected a tuple")
+        
+        # actual position is recorded as a tuple of floats
+        # position is rounded just for display and to see if the car is still on the track
+        self.position = (self.track.scaled_track[0][0],self.track.scaled_track[0][1]) #this should be a tuple of integers. interpolated_scaled_track[0] will be float
+        self.position_rounded = (round(self.position[0]),round(self.position[1]))
+        self.speed = self.track.square_size/50  # pixels per frame
+        self.direction_radians = track.GetInitialDirectionRadians()
+        self.steering_radians = 0
+        self.crashed = False
+        self.position_previous_rounded = self.position_rounded
+        
+        self.statsInfo = {
+            "distance":0.0,
+            "frames":0,
+            "average speed":0.0,
+            "rotations":0.0,
+            "CAR_SPEED_MIN":self.config.speed_min,
+            "CAR_SPEED_MAX":self.config.speed_max,
+            "laps":0,
+            "lap %":0.0
+            }
+        self.lap_counter = LapCounter(self.track)
+
+        self.latestInstructions = InstructionHistory()
+        
+        # a car without a screen is headless: it is simulated but never drawn
+        # a FrameProfiler, if the time spent sensing and steering is being recorded
+        self.profiler = None
+        # the parts of the screen the car has drawn on since the Renderer last showed them
+        self.dirty_rects = []
+
+        self.carIconGroup = []
+        if self.screen is not None:
+            import pygame
+            from .rendering import CarIcon
+            self.carIconGroup = pygame.sprite.Group()
+            self.carIcon = CarIcon(self.position_rounded[0],self.position_rounded[1], car_size=self.car_size)
+            self.carIconGroup.add(self.carIcon)
+
+    def Drive(self):
+        self.Move()
+        if self.screen is not None and not self.crashed:
+            self.Draw()
+
+    def Move(self):
+        # the physics and sensing step - this never touches the display, so it can run headless
+        track_edge_distances = self.GetTrackEdgeDistances(False)
+        if self.profiler is not None:
+            self.profiler.Mark("sensing")
+        if self.crashed:
+            return
+        
+        self.position_previous_rounded = self.position_rounded
+
+        # in future, do some neural network magic to decide how much to steer and how much to change speed
+        # for now, the controller decides, then the car keeps within its limits
+        speed_delta, steering_radians = self.controller.Decide(track_edge_distances)
+        config = self.config
+
+        if speed_delta < config.acceleration_min:
+            speed_delta = config.acceleration_min
+        
+        if speed_delta > config.acceleration_max:
+            speed_delta = config.acceleration_max
+
+        speed_new = self.speed + speed_delta
+        
+        if speed_new < config.speed_min:
+            speed_new = config.speed_min
+        
+        if speed_new > config.speed_max:
+            speed_new = config.speed_max
+        
+        self.speed = speed_new
+
+        steering_radians_previous = self.steering_radians
+        self.steering_radians = steering_radians
+
+        # restrict how much the steering can be changed per frame
+        if self.steering_radians < steering_radians_previous - config.steering_radians_delta_max:
+            self.steering_radians = steering_radians_previous - config.steering_radians_delta_max
+        elif self.steering_radians > steering_radians_previous + config.steering_radians_delta_max:
+            self.steering_radians = steering_radians_previous + config.steering_radians_delta_max
+
+        # restrict how much the steering can be per frame
+        if self.steering_radians > config.steering_radians_max:
+            self.steering_radians = config.steering_radians_max
+        elif self.steering_radians < -config.steering_radians_max:
+            self.steering_radians = -config.steering_radians_max
+
+        self.direction_radians += self.steering_radians #* self.speed # direction changes more per frame if you're goig faster
+
+        self.position = (self.position[0] + self.speed * math.cos(self.direction_radians), self.position[1] + self.speed * math.sin(self.direction_radians))
+        self.position_rounded = (round(self.position[0]),round(self.position[1]))    
+
+        self.statsInfo["frames"] += 1
+        self.statsInfo["distance"] += speed_new
+        self.statsInfo["average speed"] = self.statsInfo["distance"] // self.statsInfo["frames"]
+        self.statsInfo["rotations"] += self.steering_radians / (2 * math.pi)
+        self.lap_counter.Update(self.position)
+        progress = float(self.lap_counter.progress[0])
+        self.statsInfo["laps"] = math.floor(progress)
+        self.statsInfo["lap %"] = 100 * (progress - self.statsInfo["laps"])
+
+        self.latestInstructions.Append(self.speed, speed_delta, self.direction_radians, self.steering_radians, track_edge_distances)
+        if self.profiler is not None:
+            self.profiler.Mark("steering")
+
+    def SetSpeedLimits(self, speed_min, speed_max):
+        # change the car's speed limits while it's driving
+        self.config.speed_min = speed_min
+        self.config.speed_max = speed_max
+        self.statsInfo["CAR_SPEED_MIN"] = speed_min
+        self.statsInfo["CAR_SPEED_MAX"] = speed_max
+
+    def Draw(self):
+        # the rendering step - draws the path and moves the car icon to where Move() left the car
+        self.DrawPath()
+        self.UpdateIcon(self.position_rounded[0], self.position_rounded[1], self.direction_radians)
+
+    def DrawPath(self):
+        # colour the pixel the car is on by how fast it's going. This has to be done every step, for the path to join up
+        import pygame
+        car_speed_colour = round(255 * self.speed / self.config.speed_max)
+        car_colour = (255 - car_speed_colour, car_speed_colour, 0)
+        self.screen.set_at(self.position_rounded, car_colour)
+        self.dirty_rects.append(pygame.Rect(self.position_rounded[0],self.position_rounded[1],1,1))
+
+    def UpdateIcon(self, pos_x, pos_y, direction_radians):
+        # the icon only needs moving when the screen is about to be shown, and can be somewhere between steps
+        #self.carIconGroup.draw(self.screen)
+        self.carIconGroup.update(pos_x, pos_y, direction_radians)
+
+    def GetTrackEdgeDistances(self, draw_lines):    
+        car_on_track = self.IsOnTrack()
+        if not car_on_track:
+            self.crashed = True
+            if self.screen is not None:
+                self.DrawCrashedCar()
+            return None
+
+        # list of the distances to the edge of the track, one for each of CAR_VISION_ANGLES
+        # one car only has a few rays, which CastRays tests quickest. CastRaysSphereTraced pays off for many cars at once
+        track_edge_distances = CastRays(self.track.track_pixels, self.position_rounded, self.direction_radians)[0].tolist()
+
+        if draw_lines:
+            for vision_angle, edge_distance in zip(CAR_VISION_ANGLES, track_edge_distances):
+                self.DrawTrackEdgeLine(vision_angle, edge_distance)
+        
+        self.crashed = False
+        return track_edge_distances
+    
+    def IsOnTrack(self):
+        if self.collision == "footprint":
+            # the whole car is on the track if its middle is on the track eroded by its footprint, for the nearest heading
+            return self.track.GetFootprintTrackPixels(self.car_size)[GetFootprintHeading(self.direction_radians), self.position_rounded[0], self.position_rounded[1]]
+        return self.track.track_pixels[self.position_rounded]
+
+    def DrawTrackEdgeLine(self, vision_angle, edge_distance):
+        # draw the vision ray at vision_angle out to where it left the track
+        search_angle_radians = self.direction_radians + math.radians(vision_angle)
+        end_x = self.position_rounded[0] + edge_distance * math.cos(search_angle_radians)
+        end_y = self.position_rounded[1] + edge_distance * math.sin(search_angle_radians)
+        import pygame
+        self.dirty_rects.append(pygame.draw.line(self.screen, RED, self.position_rounded, [round(end_x), round(end_y)]))
+    
+    def DrawCrashedCar(self):
+        import pygame
+        pygame.draw.circle(self.screen, RED, self.position_rounded, TRACK_MAX_WIDTH, width=2)
+        crash_zone = pygame.Rect(self.position_rounded[0] - TRACK_MAX_WIDTH, self.position_rounded[1] - TRACK_MAX_WIDTH, 2 * TRACK_MAX_WIDTH, 2 * TRACK_MAX_WIDTH)
+        self.dirty_rects.append(crash_zone)
+
+class Fleet():
+    # lots of cars driving the same track at once, using the same rules as Car.Drive
+    # the state of every car is kept in NumPy arrays (one element per car), so the whole fleet is stepped in one go
+    # crashed cars stay in the arrays and are masked out, so a car's index never changes
+    def __init__(self, track, size, speed_min=CAR_SPEED_MIN_INITIAL, speed_max=CAR_SPEED_MAX_INITIAL, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH),
+                 controller=None, max_laps=None, acceleration_min=CAR_ACCELERATION_MIN, acceleration_max=CAR_ACCELERATION_MAX,
+                 steering_radians_max=CAR_STEERING_RADIANS_MAX, steering_radians_delta_max=CAR_STEERING_RADIANS_DELTA_MAX):
+        self.track = track
+        self.size = size
+        # see COLLISION_MODES and Car. The controller decides for every car at once with Controller.DecideBatch
+        self.collision = collision
+        self.car_size = tuple(car_size)
+        self.controller = controller or RuleController()
+        # with max_laps, each car stops once it has driven that many laps and is marked as finished
+        self.max_laps = max_laps
+        self.finished = np.zeros(size, dtype=bool)
+
+        self.positions = np.tile(np.array(self.track.scaled_track[0], dtype=float), (size, 1))
+        self.positions_rounded = np.rint(self.positions).astype(np.intp)
+        self.speeds = np.full(size, self.track.square_size/50)
+        self.directions_radians = np.full(size, track.GetInitialDirectionRadians())
+        self.steering_radians = np.zeros(size)
+        self.crashed = np.zeros(size, dtype=bool)
+
+        # the same limits as CarConfig, which can be different for every car. Scalars apply to the whole fleet
+        self.speed_min = np.broadcast_to(np.asarray(speed_min, dtype=float), (size,)).copy()
+        self.speed_max = np.broadcast_to(np.asarray(speed_max, dtype=float), (size,)).copy()
+        self.acceleration_min = np.broadcast_to(np.asarray(acceleration_min, dtype=float), (size,)).copy()
+        self.acceleration_max = np.broadcast_to(np.asarray(acceleration_max, dtype=float), (size,)).copy()
+        self.steering_radians_max = np.broadcast_to(np.asarray(steering_radians_max, dtype=float), (size,)).copy()
+        self.steering_radians_delta_max = np.broadcast_to(np.asarray(steering_radians_delta_max, dtype=float), (size,)).copy()
+
+        # the same stats as Car.statsInfo, one element per car
+        self.frames = np.zeros(size, dtype=np.int64)
+        self.distance = np.zeros(size)
+        self.rotations = np.zeros(size)
+        self.lap_counter = LapCounter(track, size)
+        # what each car last saw along CAR_VISION_ANGLES
+        self.track_edge_distances = np.zeros((size, len(CAR_VISION_ANGLES)))
+
+    @classmethod
+    def FromCarConfigs(cls, track, configs, **fleet_arguments):
+        # a fleet with a car for each CarConfig, with that car's limits
+        limits = {name:[getattr(config, name) for config in configs] for name in CarConfig.__slots__}
+        return cls(track, len(configs), **limits, **fleet_arguments)
+
+    def Step(self):
+        # move every car that hasn't crashed or finished by one frame. Returns how many cars were still driving
+        active = np.flatnonzero(~self.crashed & ~self.finished)
+        if not active.size:
+            return 0
+
+        # a car is judged to have crashed if the pixel it's on isn't track, or isn't on the track eroded by the car's footprint
+        # The edges of the window are never track
+        track_pixels = self.track.track_pixels
+        x = np.clip(self.positions_rounded[active, 0], 0, track_pixels.shape[0] - 1)
+        y = np.clip(self.positions_rounded[active, 1], 0, track_pixels.shape[1] - 1)
+        if self.collision == "footprint":
+            on_track = self.track.GetFootprintTrackPixels(self.car_size)[GetFootprintHeading(self.directions_radians[active]), x, y]
+        else:
+            on_track = track_pixels[x, y]
+        self.crashed[active[~on_track]] = True
+        active = active[on_track]
+        if not active.size:
+            return 0
+
+        track_edge_distances = CastRaysSphereTraced(self.track.GetTrackDistances(), self.positions_rounded[active], self.directions_radians[active])
+        self.track_edge_distances[active] = track_edge_distances
+
+        # the same limits as Car.Drive, for every car at once
+        speed_delta, steering_radians = self.controller.DecideBatch(track_edge_distances, active)
+        speed_delta = np.clip(speed_delta, self.acceleration_min[active], self.acceleration_max[active])
+        speeds = np.clip(self.speeds[active] + speed_delta, self.speed_min[active], self.speed_max[active])
+        steering_radians_previous = self.steering_radians[active]
+
+        # restrict how much the steering can be changed per frame and how much it can be
+        steering_radians_delta_max = self.steering_radians_delta_max[active]
+        steering_radians_max = self.steering_radians_max[active]
+        steering_radians = np.clip(steering_radians, steering_radians_previous - steering_radians_delta_max, steering_radians_previous + steering_radians_delta_max)
+        steering_radians = np.clip(steering_radians, -steering_radians_max, steering_radians_max)
+
+        directions_radians = self.directions_radians[active] + steering_radians
+        self.positions[active, 0] += speeds * np.cos(directions_radians)
+        self.positions[active, 1] += speeds * np.sin(directions_radians)
+        self.positions_rounded[active] = np.rint(self.positions[active])
+
+        self.speeds[active] = speeds
+        self.steering_radians[active] = steering_radians
+        self.directions_radians[active] = directions_radians
+
+        self.frames[active] += 1
+        self.distance[active] += speeds
+        self.rotations[active] += steering_radians / (2 * math.pi)
+        self.lap_counter.Update(self.positions[active], active)
+        if self.max_laps is not None:
+            self.finished[active] = self.lap_counter.progress[active] >= self.max_laps
+        return active.size
+
+    def GetStats(self):
+        # the same keys as Car.statsInfo, with an array of values (one per car) for each
+        average_speed = np.where(self.frames > 0, self.distance // np.maximum(self.frames, 1), 0)
+        return {
+            "distance":self.distance,
+            "frames":self.frames,
+            "average speed":average_speed,
+            "rotations":self.rotations,
+            "CAR_SPEED_MIN":self.speed_min,
+            "CAR_SPEED_MAX":self.speed_max,
+            "laps":self.lap_counter.GetLaps(),
+            "progress":self.lap_counter.progress
+            }
+
+    def GetRanking(self):
+        # car indices, from the car that got furthest round the track to the one that got least far
+        return np.argsort(-self.lap_counter.progress, kind="stable")
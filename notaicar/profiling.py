@@ -0,0 +1,95 @@
+# timing each part of every frame, see FrameProfiler
+import csv
+import json
+import time
+from collections import deque
+import numpy as np
+from .constants import *
+
+class FrameProfiler():
+    # records how long each part of every frame takes and keeps the last window_frames of each, for percentiles
+    # call StartFrame at the start of a frame, Mark(name) at the end of each part and EndFrame at the end of the frame.
+    # Mark counts the time since the last Mark (or StartFrame) against name
+    # when it's not enabled, every call returns straight away, so it can be left in place
+    def __init__(self, enabled=False, output_path=None, window_frames=PROFILER_WINDOW_FRAMES):
+        self.enabled = enabled
+        self.output_path = output_path
+        self.window_frames = window_frames
+        self.section_timings = {section:deque(maxlen=window_frames) for section in PROFILER_SECTIONS}
+        # percentiles take a while to work out, so they're only updated every so often
+        self.percentiles = {}
+        self.frames_since_percentiles = PROFILER_PERCENTILE_FRAMES
+        # frames are only kept if they're going to be saved, and only until there are enough of them to write to output_path
+        self.frames = [] if output_path else None
+        self.output_file = None
+        self.output_sections = []
+        self.output_frame_count = 0
+        self.frame = {}
+        self.last_time = 0.0
+
+    def StartFrame(self):
+        if not self.enabled:
+            return
+        self.frame = {}
+        self.last_time = time.perf_counter()
+
+    def Mark(self, section):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.frame[section] = self.frame.get(section, 0.0) + now - self.last_time
+        self.last_time = now
+
+    def EndFrame(self):
+        if not self.enabled:
+            return
+        for section, seconds in self.frame.items():
+            self.section_timings.setdefault(section, deque(maxlen=self.window_frames)).append(seconds)
+        if self.frames is not None:
+            self.frames.append(self.frame)
+            if len(self.frames) >= PROFILER_OUTPUT_CHUNK_FRAMES:
+                self.WriteFrames()
+        self.frames_since_percentiles += 1
+
+    def GetPercentiles(self, update_now=False):
+        # {section: (p50, p95, p99)} in milliseconds, over the last window_frames frames
+        # updated every PROFILER_PERCENTILE_FRAMES frames, unless update_now
+        if update_now or self.frames_since_percentiles >= PROFILER_PERCENTILE_FRAMES:
+            self.percentiles = {}
+            for section, timings in self.section_timings.items():
+                if timings:
+                    self.percentiles[section] = tuple(np.percentile(timings, (50, 95, 99)) * 1000)
+            self.frames_since_percentiles = 0
+        return self.percentiles
+
+    def WriteFrames(self):
+        # write the frames kept so far to output_path, which is started the first time: a .csv has a row per frame,
+        # anything else is JSON, with the frames first and then, once Save finishes it, the percentiles
+        if self.output_file is None:
+            self.output_sections = list(self.section_timings)
+            if self.output_path.endswith(".csv"):
+                self.output_file = open(self.output_path, "w", newline="")
+                csv.writer(self.output_file).writerow(["frame"] + [section + " ms" for section in self.output_sections])
+            else:
+                self.output_file = open(self.output_path, "w")
+                self.output_file.write('{"frames ms":[')
+        if self.output_path.endswith(".csv"):
+            writer = csv.writer(self.output_file)
+            for frame_number, frame in enumerate(self.frames, self.output_frame_count):
+                writer.writerow([frame_number] + [round(frame[section] * 1000, 4) if section in frame else "" for section in self.output_sections])
+        else:
+            for frame_number, frame in enumerate(self.frames, self.output_frame_count):
+                self.output_file.write(("\n" if frame_number == 0 else ",\n") + json.dumps({section:seconds * 1000 for section, seconds in frame.items()}))
+        self.output_frame_count += len(self.frames)
+        self.frames.clear()
+
+    def Save(self):
+        # write the frames that are left to output_path and finish it. Frames after this aren't saved
+        if not self.enabled or not self.output_path or self.frames is None:
+            return
+        self.WriteFrames()
+        if not self.output_path.endswith(".csv"):
+            percentiles = {section:dict(zip(("p50", "p95", "p99"), values)) for section, values in self.GetPercentiles(True).items()}
+            self.output_file.write('\n],\n"percentiles ms":' + json.dumps(percentiles, indent=1) + "}\n")
+        self.output_file.close()
+        self.frames = None
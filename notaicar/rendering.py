@@ -0,0 +1,156 @@
+# drawing on the screen: the car icons, the stats panel and the Renderer that puts them on the display
+import math
+import numpy as np
+import pygame
+from .constants import *
+
+# fonts that have been made, by size, see GetFont
+FONTS = {}
+
+# rotated car images for each image and angle resolution that has been used
+CAR_SPRITES = {}
+
+def GetCarSprites(image_path, angle_resolution=CAR_SPRITE_ANGLE_RESOLUTION, car_size=(CAR_LENGTH, CAR_WIDTH)):
+    # pygame.transform.rotate makes a new Surface every time, so each car image is rotated once to every
+    # angle_resolution degrees and the rotated images are shared by every CarIcon that uses that image
+    key = (image_path, angle_resolution, tuple(car_size))
+    if key not in CAR_SPRITES:
+        image = pygame.image.load(image_path)
+        # the images point up, so the car's length is their height
+        if image.get_size() != (car_size[1], car_size[0]):
+            image = pygame.transform.smoothscale(image, (car_size[1], car_size[0]))
+        # images in the same format as the display are quicker to draw, if there is a display
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()
+        CAR_SPRITES[key] = [pygame.transform.rotate(image, angle) for angle in np.arange(0, 360, angle_resolution)]
+    return CAR_SPRITES[key]
+
+class CarIcon(pygame.sprite.Sprite):
+    def __init__(self, pos_x, pos_y, image_path=CAR_IMAGE, angle_resolution=CAR_SPRITE_ANGLE_RESOLUTION, car_size=(CAR_LENGTH, CAR_WIDTH)):
+        super().__init__()
+        self.sprites = GetCarSprites(image_path, angle_resolution, car_size)
+        self.angle_resolution = angle_resolution
+        self.image = self.sprites[0] #38x76
+        self.rect = self.image.get_rect()
+        self.rect.center = [pos_x,pos_y]
+
+    def update(self, pos_x, pos_y, angle_radians):
+        # use the rotated image nearest to the angle, keeping the image centred on the car
+        angle = 270 - math.degrees(angle_radians)
+        self.image = self.sprites[round(angle / self.angle_resolution) % len(self.sprites)]
+        self.rect = self.image.get_rect(center=(pos_x,pos_y))
+
+def GetFont(size=12):
+    # making a font is slow, so each size is only made once
+    if size not in FONTS:
+        FONTS[size] = pygame.font.SysFont('Arial', size, bold=False)
+    return FONTS[size]
+
+class StatsPanel():
+    # the stats shown in the top left corner of the screen
+    # each line is only rendered again when its text changes, and the panel is only rebuilt when a line has changed
+    def __init__(self):
+        self.line_images = []
+        self.surface = None
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        # the area covered by the panel before and after it last changed, which needs redrawing
+        self.dirty_rect = pygame.Rect(0, 0, 0, 0)
+        self.changed = False
+
+    def Update(self, statsInfo, profiler=None):
+        lines = [k + ': ' + str(round(v)) for k,v in statsInfo.items()]
+        if profiler is not None and profiler.enabled:
+            for section, (p50, p95, p99) in profiler.GetPercentiles().items():
+                lines.append(f"{section} ms: p50 {p50:.2f} p95 {p95:.2f} p99 {p99:.2f}")
+
+        self.changed = len(lines) != len(self.line_images)
+        line_images = []
+        for line_number, line in enumerate(lines):
+            if line_number < len(self.line_images) and self.line_images[line_number][0] == line:
+                line_images.append(self.line_images[line_number])
+                continue
+            img = GetFont().render(line, True,
+                      pygame.Color(BLACK),
+                      pygame.Color(WHITE))
+            line_images.append((line, img))
+            self.changed = True
+        if not self.changed:
+            return
+
+        # lay the lines out down the left of the screen, on a transparent surface
+        self.line_images = line_images
+        textTop = 0
+        line_positions = []
+        for _, img in line_images:
+            textTop += img.get_height() + 10
+            line_positions.append((10, textTop))
+        width = max((10 + img.get_width() for _, img in line_images), default=0)
+        height = textTop + (line_images[-1][1].get_height() if line_images else 0)
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for (_, img), line_position in zip(line_images, line_positions):
+            self.surface.blit(img, line_position)
+
+        rect = self.surface.get_rect()
+        self.dirty_rect = self.rect.union(rect)
+        self.rect = rect
+
+class Renderer():
+    # draws the background, the cars and the stats panel on the screen
+    # with dirty_rects, only the parts of the screen that have changed are drawn and sent to the display:
+    # where each car icon was and now is, whatever the cars drew on the background and the stats panel if it changed
+    # otherwise the whole screen is drawn and flipped every frame
+    def __init__(self, screen, background, dirty_rects=True):
+        self.screen = screen
+        self.background = background
+        self.dirty_rects = dirty_rects
+        self.previous_icon_rects = []
+        self.full_redraw = True
+        # a FrameProfiler, if the time spent rendering and sending the screen to the display is being recorded
+        self.profiler = None
+
+    def Reset(self):
+        # draw everything next frame, e.g. after a new track has been drawn on the background
+        self.full_redraw = True
+
+    def Draw(self, cars, stats_panel):
+        icon_rects = [sprite.rect.copy() for car in cars for sprite in car.carIconGroup]
+
+        if self.full_redraw or not self.dirty_rects:
+            self.screen.blit(self.background, (0,0))
+            for car in cars:
+                car.carIconGroup.draw(self.screen)
+                car.dirty_rects.clear()
+            if stats_panel.surface is not None:
+                self.screen.blit(stats_panel.surface, stats_panel.rect)
+            self.Mark("rendering")
+            pygame.display.flip()
+            self.Mark("flip")
+            self.previous_icon_rects = icon_rects
+            self.full_redraw = False
+            return
+
+        dirty_rects = self.previous_icon_rects + icon_rects
+        for car in cars:
+            dirty_rects += car.dirty_rects
+            car.dirty_rects.clear()
+        # the stats panel goes on top, so it's needed if it changed or anything under it was redrawn
+        if stats_panel.surface is not None and (stats_panel.changed or stats_panel.rect.collidelist(dirty_rects) != -1):
+            dirty_rects.append(stats_panel.dirty_rect if stats_panel.changed else stats_panel.rect)
+            stats_panel_needed = True
+        else:
+            stats_panel_needed = False
+
+        for dirty_rect in dirty_rects:
+            self.screen.blit(self.background, dirty_rect, dirty_rect)
+        for car in cars:
+            car.carIconGroup.draw(self.screen)
+        if stats_panel_needed:
+            self.screen.blit(stats_panel.surface, stats_panel.rect)
+        self.Mark("rendering")
+        pygame.display.update(dirty_rects)
+        self.Mark("flip")
+        self.previous_icon_rects = icon_rects
+
+    def Mark(self, section):
+        if self.profiler is not None:
+            self.profiler.Mark(section)
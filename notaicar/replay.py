@@ -0,0 +1,130 @@
+# watching a run saved with TelemetryRecorder, see ReplayViewer
+import os
+import numpy as np
+import pygame
+from .constants import *
+from .rendering import CarIcon, Renderer, StatsPanel
+from .telemetry import TelemetryFile
+from .track import GetWindowSize, Track
+
+# how far each key moves a replay, in frames, see ReplayViewer
+REPLAY_SEEK_KEYS = {pygame.K_LEFT:-1, pygame.K_RIGHT:1, pygame.K_PAGEUP:-100, pygame.K_PAGEDOWN:100}
+
+class ReplayCar():
+    # just enough of a Car for Renderer to draw it in a replay
+    def __init__(self, image_path, car_size):
+        self.dirty_rects = []
+        self.carIcon = CarIcon(0, 0, image_path, car_size=car_size)
+        self.carIconGroup = pygame.sprite.Group(self.carIcon)
+
+class ReplayViewer():
+    # shows a telemetry file saved by RunHeadless, without driving the cars again. The track is made again from its seed
+    # space pauses, left and right step back and forward a frame, page up and page down 100 frames, home and end go to the start and end,
+    # c goes to the next frame a car crashed in and clicking on the screen goes that far through the replay
+    def __init__(self, path, cache=None):
+        self.telemetry = TelemetryFile(path)
+        header = self.telemetry.header
+        self.frames = self.telemetry.frames
+        self.crash_frames = self.telemetry.GetCrashFrames()
+        self.speed_max = np.array(header["speed max"])
+
+        pygame.init()
+        self.clock = pygame.time.Clock()
+        pygame.display.set_icon(pygame.image.load(LOGO_IMAGE))
+        pygame.display.set_caption(f"AI car replay: {os.path.basename(path)}")
+        self.window = GetWindowSize(**header["track size"])
+        self.screen = pygame.display.set_mode(self.window)
+
+        # the track is drawn once. The background is the track plus the cars' paths up to the frame being shown
+        self.track_surface = pygame.Surface(self.window)
+        # files recorded before periodic widths were an option never had them
+        Track(self.window, self.track_surface, header["seed"], **header["track size"], periodic_widths=header.get("periodic widths", False)).Create(cache)
+        self.background = self.track_surface.copy()
+        self.drawn_frames = 0
+        self.renderer = Renderer(self.screen, self.background)
+        self.statsPanel = StatsPanel()
+        self.cars = [ReplayCar(CAR_IMAGES[car % len(CAR_IMAGES)], header["car size"]) for car in range(self.telemetry.car_count)]
+
+    def Run(self, frame=0):
+        if not len(self.frames):
+            print(f"{self.telemetry.path} has no frames to replay")
+            return
+        paused = False
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    pygame.quit()
+                    return
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        paused = not paused
+                    elif event.key in REPLAY_SEEK_KEYS:
+                        frame += REPLAY_SEEK_KEYS[event.key]
+                        paused = True
+                    elif event.key == pygame.K_HOME:
+                        frame = 0
+                    elif event.key == pygame.K_END:
+                        frame = len(self.frames) - 1
+                    elif event.key == pygame.K_c:
+                        later_crash_frames = self.crash_frames[self.crash_frames > frame]
+                        if later_crash_frames.size:
+                            frame = later_crash_frames.min()
+                            paused = True
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    frame = round(event.pos[0] / (self.window[0] - 1) * (len(self.frames) - 1))
+
+            frame = int(np.clip(frame, 0, len(self.frames) - 1))
+            self.ShowFrame(frame)
+            if not paused and frame < len(self.frames) - 1:
+                frame += 1
+            self.clock.tick(200)
+
+    def ShowFrame(self, frame):
+        # going back means the paths have to be drawn again from the start. Going forward only draws the frames in between
+        if frame + 1 < self.drawn_frames:
+            self.background.blit(self.track_surface, (0,0))
+            self.drawn_frames = 0
+        if frame + 1 - self.drawn_frames > 1:
+            self.renderer.Reset()
+        self.DrawPaths(self.drawn_frames, frame + 1)
+        self.drawn_frames = frame + 1
+
+        records = self.frames[frame]
+        for car, record in zip(self.cars, records):
+            car.carIcon.update(round(float(record["position"][0])), round(float(record["position"][1])), float(record["direction_radians"]))
+        self.statsPanel.Update({
+            "frame":frame,
+            "frames":len(self.frames),
+            "cars crashed":int(records["crashed"].sum()),
+            "top speed":float(records["speed"].max()),
+            })
+        self.renderer.Draw(self.cars, self.statsPanel)
+
+    def DrawPaths(self, first_frame, last_frame):
+        # colour in where each car was in frames first_frame to last_frame - 1, in the same colours as Car.Draw,
+        # with a circle round each car that crashed, like Car.DrawCrashedCar
+        # the frames are drawn in pieces that end with a crash, so everything is drawn in the same order as going a frame at a time
+        crash_frames = np.unique(self.crash_frames[(self.crash_frames >= first_frame) & (self.crash_frames < last_frame)])
+        for piece_first_frame, piece_last_frame in zip([first_frame] + (crash_frames + 1).tolist(), crash_frames.tolist() + [last_frame - 1]):
+            self.DrawPathPixels(piece_first_frame, piece_last_frame + 1)
+            for car in np.flatnonzero(self.crash_frames == piece_last_frame).tolist():
+                position = np.clip(np.rint(self.frames[piece_last_frame, car]["position"]).astype(np.intp), 0, np.array(self.window) - 1)
+                self.cars[car].dirty_rects.append(pygame.draw.circle(self.background, RED, position.tolist(), TRACK_MAX_WIDTH, width=2))
+
+    def DrawPathPixels(self, first_frame, last_frame):
+        records = self.frames[first_frame:last_frame]
+        if not len(records):
+            return
+        driving = ~records["crashed"]
+        positions = np.clip(np.rint(records["position"]).astype(np.intp), 0, np.array(self.window) - 1)
+        car_speed_colours = np.clip(np.rint(255 * records["speed"] / self.speed_max), 0, 255).astype(np.uint8)
+        frame_numbers, cars = np.nonzero(driving)
+        pixels = pygame.surfarray.pixels3d(self.background)
+        pixels[positions[frame_numbers, cars, 0], positions[frame_numbers, cars, 1]] = np.stack(
+            (255 - car_speed_colours[driving], car_speed_colours[driving], np.zeros(len(cars), dtype=np.uint8)), axis=1)
+        del pixels
+        # when everything is going to be redrawn anyway, there's no need to keep track of the pixels
+        if self.renderer.full_redraw:
+            return
+        for frame_number, car in zip(frame_numbers.tolist(), cars.tolist()):
+            self.cars[car].dirty_rects.append(pygame.Rect(*positions[frame_number, car], 1, 1))
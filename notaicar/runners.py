@@ -0,0 +1,219 @@
+# running lots of cars and tracks without a display: headless runs, evaluations and parameter sweeps
+# none of this needs pygame, so worker processes start quickly
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .constants import *
+from .physics import Car, Fleet, RuleController
+from .profiling import FrameProfiler
+from .telemetry import GetTelemetryHeader, GetTelemetryPath, TelemetryRecorder
+from .track import Track
+
+def RunHeadless(track_count, max_frames, car_count=1, first_seed=None, cache=None, track_size=None, profiler=None, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH),
+                record_directory=None):
+    # drive car_count cars round track_count new tracks without ever touching pygame.display
+    # there's no clock.tick, so this runs as many frames per second as the CPU allows
+    # a single car is driven by Car. More than one is driven as a Fleet, each car with a different top speed
+    # with record_directory, every frame of every car is saved to a telemetry file for each track, to look at with Replay
+    track_size = track_size or {}
+    if record_directory:
+        os.makedirs(record_directory, exist_ok=True)
+    recorder = None
+    profiler = profiler or FrameProfiler()
+    total_frames = 0
+    total_drive_seconds = 0.0
+    total_create_seconds = 0.0
+
+    for track_number in range(track_count):
+        create_start = time.perf_counter()
+        track = Track(None, None, None if first_seed is None else first_seed + track_number, **track_size)
+        track.Create(cache)
+        if collision == "footprint":
+            # count the time to erode the track as part of creating it, not driving it
+            track.GetFootprintTrackPixels(car_size)
+        if car_count == 1:
+            car = Car(None, track, collision, car_size)
+            if profiler.enabled:
+                car.profiler = profiler
+        else:
+            fleet = Fleet(track, car_count, speed_max=np.linspace(CAR_SPEED_MIN_INITIAL + 1, 2 * CAR_SPEED_MAX_INITIAL, car_count), collision=collision, car_size=car_size)
+        if record_directory:
+            speed_max = [car.config.speed_max] if car_count == 1 else fleet.speed_max
+            recorder = TelemetryRecorder(GetTelemetryPath(record_directory, track_number + 1, track.seed), car_count, GetTelemetryHeader(track, speed_max, collision, car_size))
+        total_create_seconds += time.perf_counter() - create_start
+
+        frames = 0
+        drive_start = time.perf_counter()
+        if car_count == 1:
+            while not car.crashed and frames < max_frames:
+                profiler.StartFrame()
+                car.Drive()
+                if recorder is not None:
+                    recorder.RecordCar(car)
+                profiler.EndFrame()
+                frames += 1
+        else:
+            # count every car driven in every frame
+            for _ in range(max_frames):
+                cars_driving = fleet.Step()
+                # the frame the last car crashed in is recorded too
+                if recorder is not None:
+                    recorder.RecordFleet(fleet)
+                if cars_driving == 0:
+                    break
+                frames += cars_driving
+        if recorder is not None:
+            recorder.Close()
+        total_drive_seconds += time.perf_counter() - drive_start
+        total_frames += frames
+
+        if car_count == 1:
+            print(f"track {track_number + 1}: frames {car.statsInfo['frames']}, distance {round(car.statsInfo['distance'])}, "
+                  f"average speed {car.statsInfo['average speed']}, rotations {car.statsInfo['rotations']:.2f}, crashed {car.crashed}")
+        else:
+            best = fleet.GetRanking()[0]
+            print(f"track {track_number + 1}: {fleet.crashed.sum()} of {car_count} cars crashed, "
+                  f"furthest {fleet.lap_counter.progress[best]:.2f} laps with top speed {fleet.speed_max[best]:.1f}")
+
+    frames_per_second = total_frames / total_drive_seconds if total_drive_seconds > 0 else 0.0
+    print(f"{total_frames} frames in {total_drive_seconds:.3f}s: {frames_per_second:.0f} frames/second "
+          f"(plus {total_create_seconds:.3f}s creating {track_count} tracks)")
+    for section, (p50, p95, p99) in profiler.GetPercentiles(True).items():
+        print(f"{section} ms: p50 {p50:.3f} p95 {p95:.3f} p99 {p99:.3f}")
+    profiler.Save()
+    return frames_per_second
+
+def DriveLap(track, max_frames, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH)):
+    # drive one headless car until it crashes, gets back round to the start or runs out of frames
+    car = Car(None, track, collision, car_size)
+    lap_complete = False
+
+    for _ in range(max_frames):
+        car.Drive()
+        if car.crashed:
+            break
+        if car.lap_counter.progress[0] >= 1:
+            lap_complete = True
+            break
+
+    return car, lap_complete
+
+def EvaluateTrack(seed, max_frames, cache=None, track_size=None, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH)):
+    # drive a lap of the track generated from seed and return its stats. Runs in a worker process
+    track = Track(None, None, seed, **(track_size or {}))
+    track.Create(cache)
+    car, lap_complete = DriveLap(track, max_frames, collision, car_size)
+    return {
+        "seed":seed,
+        "distance":car.statsInfo["distance"],
+        "frames":car.statsInfo["frames"],
+        "average speed":car.statsInfo["average speed"],
+        "rotations":car.statsInfo["rotations"],
+        "crashed":car.crashed,
+        "lap complete":lap_complete
+        }
+
+def EvaluateTracks(seeds, max_frames, workers=None, cache=None, track_size=None, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH)):
+    # fan the seeds out over a pool of worker processes, one track per seed
+    # results come back in the same order as seeds, so the same seeds always give the same results
+    seeds = list(seeds)
+    workers = workers or os.cpu_count()
+    chunk_size = max(1, len(seeds) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(EvaluateTrack, seeds, [max_frames] * len(seeds), [cache] * len(seeds), [track_size] * len(seeds), [collision] * len(seeds), [car_size] * len(seeds), chunksize=chunk_size))
+
+def SummariseEvaluation(results):
+    # average the stats over every track, plus how often cars crashed or completed a lap
+    summary = {"tracks":len(results)}
+    for key in ("distance", "frames", "average speed", "rotations", "crashed", "lap complete"):
+        summary[key] = float(np.mean([result[key] for result in results])) if results else 0.0
+    return summary
+
+def RunEvaluation(seeds, max_frames, workers, output_path, cache=None, track_size=None, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH)):
+    start = time.perf_counter()
+    results = EvaluateTracks(seeds, max_frames, workers, cache, track_size, collision, car_size)
+    seconds = time.perf_counter() - start
+    summary = SummariseEvaluation(results)
+    print(f"{summary['tracks']} tracks in {seconds:.2f}s: {summary['tracks'] / seconds:.1f} tracks/second")
+    print(f"laps completed {summary['lap complete']:.1%}, crashed {summary['crashed']:.1%}, average distance {summary['distance']:.0f}, "
+          f"average frames {summary['frames']:.0f}, average speed {summary['average speed']:.1f}, average rotations {summary['rotations']:.2f}")
+    if output_path:
+        with open(output_path, "w") as output_file:
+            json.dump({"summary":summary, "results":results}, output_file, indent=1)
+    return results
+
+def GetParameterGrid(parameter_values):
+    # every combination of the values of each parameter, e.g. {"speed_gain":[3, 4], "steering_gain":[4, 5, 6]} gives 6 parameter sets
+    names = list(parameter_values)
+    return [dict(zip(names, values)) for values in itertools.product(*parameter_values.values())]
+
+def GetRandomParameters(parameter_values, count, seed=None):
+    # count parameter sets, with each parameter picked at random between the smallest and largest of its values
+    rng = np.random.default_rng(seed)
+    return [{name:float(rng.uniform(min(values), max(values))) for name, values in parameter_values.items()} for _ in range(count)]
+
+def EvaluateSweepTrack(seed, parameter_sets, max_frames, cache=None, track_size=None, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH)):
+    # drive a lap of the track generated from seed with every parameter set at once. Runs in a worker process
+    track = Track(None, None, seed, **(track_size or {}))
+    track.Create(cache)
+    return EvaluateFleet(track, parameter_sets, max_frames, collision, car_size)
+
+def EvaluateFleet(track, parameter_sets, max_frames, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH)):
+    # drive a lap of a track that has already been made with every parameter set at once, as a Fleet with one car for each
+    # returns the same stats as EvaluateTrack for each parameter set
+    fleet = Fleet(track, len(parameter_sets), collision=collision, car_size=car_size, controller=RuleController.FromParameterSets(parameter_sets), max_laps=1)
+    for _ in range(max_frames):
+        if fleet.Step() == 0:
+            break
+
+    stats = fleet.GetStats()
+    return [{
+        "seed":track.seed,
+        "distance":float(stats["distance"][car]),
+        "frames":int(stats["frames"][car]),
+        "average speed":float(stats["average speed"][car]),
+        "rotations":float(stats["rotations"][car]),
+        "crashed":bool(fleet.crashed[car]),
+        "lap complete":bool(fleet.finished[car])
+        } for car in range(fleet.size)]
+
+def SweepControllers(parameter_sets, seeds, max_frames, workers=None, cache=None, track_size=None, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH)):
+    # evaluate every parameter set on every seed's track, spread over a pool of worker processes
+    # each task drives one track with a batch of parameter sets, split up so there are enough tasks to keep every worker busy
+    # returns the results for each parameter set, in the same order as parameter_sets
+    seeds = list(seeds)
+    workers = workers or os.cpu_count()
+    batch_count = min(len(parameter_sets), max(1, -(-4 * workers // len(seeds))))
+    batches = [batch.tolist() for batch in np.array_split(np.arange(len(parameter_sets)), batch_count)]
+    tasks = [(seed, batch) for seed in seeds for batch in batches]
+
+    results = [[] for _ in parameter_sets]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        task_results = executor.map(EvaluateSweepTrack, [seed for seed, _ in tasks], [[parameter_sets[i] for i in batch] for _, batch in tasks],
+                                    *([argument] * len(tasks) for argument in (max_frames, cache, track_size, collision, car_size)))
+        for (_, batch), batch_results in zip(tasks, task_results):
+            for i, result in zip(batch, batch_results):
+                results[i].append(result)
+    return results
+
+def RunSweep(parameter_sets, seeds, max_frames, workers, output_path, cache=None, track_size=None, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH), top=10):
+    # sweep the controller parameters and list the best parameter sets: the ones that complete most laps, then the fastest
+    start = time.perf_counter()
+    results = SweepControllers(parameter_sets, seeds, max_frames, workers, cache, track_size, collision, car_size)
+    seconds = time.perf_counter() - start
+    sweep = [{"parameters":{**CONTROLLER_PARAMETERS, **parameter_set}, "summary":SummariseEvaluation(set_results), "results":set_results}
+             for parameter_set, set_results in zip(parameter_sets, results)]
+    sweep.sort(key=lambda entry: (-entry["summary"]["lap complete"], -entry["summary"]["distance"] / max(entry["summary"]["frames"], 1)))
+
+    print(f"{len(parameter_sets)} parameter sets on {len(results[0]) if results else 0} tracks in {seconds:.2f}s")
+    for entry in sweep[:top]:
+        parameters = ", ".join(f"{name} {value:.3g}" for name, value in entry["parameters"].items())
+        print(f"laps completed {entry['summary']['lap complete']:.1%}, average distance {entry['summary']['distance']:.0f}, "
+              f"average frames {entry['summary']['frames']:.0f}: {parameters}")
+    if output_path:
+        with open(output_path, "w") as output_file:
+            json.dump(sweep, output_file, indent=1)
+    return sweep
@@ -0,0 +1,82 @@
+# what a car can see: vision rays cast from cars to the edge of the track, and the shape of a car for footprint collisions
+# only needs NumPy
+import math
+import numpy as np
+from .constants import *
+
+def CastRays(track_pixels, positions, directions_radians):
+    # batched sensor: how far each car can see along each of CAR_VISION_ANGLES before leaving the track
+    # positions is an (n,2) array of rounded car positions and directions_radians an (n,) array
+    # returns an (n, len(CAR_VISION_ANGLES)) array of distances, the same as walking each ray one pixel at a time
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    directions_radians = np.asarray(directions_radians, dtype=float).reshape(-1)
+    search_angles = directions_radians[:, None] + CAR_VISION_ANGLES_RADIANS[None, :]
+
+    # sample coordinates for every step of every ray: shape (cars, angles, steps)
+    test_x = np.rint(positions[:, 0, None, None] + np.cos(search_angles)[:, :, None] * CAR_VISION_STEPS)
+    test_y = np.rint(positions[:, 1, None, None] + np.sin(search_angles)[:, :, None] * CAR_VISION_STEPS)
+    # the edges of the window are never track, so clipping can't hide the edge of the track
+    test_x = np.clip(test_x, 0, track_pixels.shape[0] - 1).astype(np.intp)
+    test_y = np.clip(test_y, 0, track_pixels.shape[1] - 1).astype(np.intp)
+
+    off_track = ~track_pixels[test_x, test_y]
+    # argmax finds the first off-track sample; rays that never leave the track see the full distance
+    edge_distances = np.where(off_track.any(axis=2), off_track.argmax(axis=2) + 1, CAR_VISION_STEPS[-1])
+    return edge_distances
+
+def CastRaysSphereTraced(track_distances, positions, directions_radians):
+    # the same answer as CastRays but, instead of testing every pixel along a ray, jump along it using
+    # track_distances (how far each pixel is from the nearest off-track pixel), so each ray takes a handful of steps
+    # only the same whole-pixel steps as CastRays are ever tested and a jump never skips an off-track one:
+    # two samples j steps apart are at most j + sqrt(2) pixels apart after rounding, so jumping by floor(clearance) - 1 is safe
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    directions_radians = np.asarray(directions_radians, dtype=float).reshape(-1)
+    search_angles = (directions_radians[:, None] + CAR_VISION_ANGLES_RADIANS[None, :]).ravel()
+    origin_x = np.repeat(positions[:, 0], len(CAR_VISION_ANGLES))
+    origin_y = np.repeat(positions[:, 1], len(CAR_VISION_ANGLES))
+    delta_x = np.cos(search_angles)
+    delta_y = np.sin(search_angles)
+
+    max_step = CAR_VISION_STEPS[-1]
+    edge_distances = np.full(search_angles.shape, max_step)
+    ray_steps = np.ones(search_angles.shape)
+    active = np.arange(search_angles.size)
+
+    while active.size > SPHERE_TRACE_MIN_RAYS:
+        steps = ray_steps[active]
+        test_x = np.clip(np.rint(origin_x[active] + delta_x[active] * steps), 0, track_distances.shape[0] - 1).astype(np.intp)
+        test_y = np.clip(np.rint(origin_y[active] + delta_y[active] * steps), 0, track_distances.shape[1] - 1).astype(np.intp)
+        clearance = track_distances[test_x, test_y]
+
+        off_track = clearance == 0
+        edge_distances[active[off_track]] = steps[off_track]
+
+        # rays that jump past the vision distance without leaving the track see the full distance
+        steps = steps + np.maximum(np.floor(clearance) - 1, 1)
+        still_going = ~off_track & (steps <= max_step)
+        active = active[still_going]
+        ray_steps[active] = steps[still_going]
+
+    if active.size:
+        # rays that graze the edge of the track can only creep along it and a few rays are quicker to test in one go
+        # so finish the few that are left
+        # by testing every remaining step at once, like CastRays does. Steps already passed are known to be on the track
+        test_x = np.clip(np.rint(origin_x[active, None] + delta_x[active, None] * CAR_VISION_STEPS), 0, track_distances.shape[0] - 1).astype(np.intp)
+        test_y = np.clip(np.rint(origin_y[active, None] + delta_y[active, None] * CAR_VISION_STEPS), 0, track_distances.shape[1] - 1).astype(np.intp)
+        off_track = (track_distances[test_x, test_y] == 0) & (CAR_VISION_STEPS >= ray_steps[active, None])
+        edge_distances[active] = np.where(off_track.any(axis=1), off_track.argmax(axis=1) + 1, max_step)
+
+    return edge_distances.reshape(-1, len(CAR_VISION_ANGLES))
+
+def GetCarFootprint(heading_radians, length=CAR_LENGTH, width=CAR_WIDTH):
+    # the pixels covered by a length x width car pointing along heading_radians, as a square array of booleans with the car in the middle
+    half_size = math.ceil(math.hypot(length, width) / 2)
+    offsets = np.arange(-half_size, half_size + 1)
+    x, y = np.meshgrid(offsets, offsets, indexing="ij")
+    along = x * math.cos(heading_radians) + y * math.sin(heading_radians)
+    across = y * math.cos(heading_radians) - x * math.sin(heading_radians)
+    return (np.abs(along) <= length / 2) & (np.abs(across) <= width / 2)
+
+def GetFootprintHeading(direction_radians):
+    # which of the CAR_FOOTPRINT_HEADINGS is nearest to direction_radians. Works for arrays too
+    return np.rint(np.asarray(direction_radians) * (CAR_FOOTPRINT_HEADINGS / math.pi)).astype(np.intp) % CAR_FOOTPRINT_HEADINGS
@@ -0,0 +1,339 @@
+# evaluating jobs sent over a socket by a server that keeps running, see EvaluationServer
+# jobs and replies are JSON, one per line. A job is e.g.
+#   {"id":"a", "seeds":[0, 1, 2], "parameter_sets":[{"speed_gain":3}, {"speed_gain":5}], "max_frames":3000}
+# where everything but seeds can be left out. The collision mode and car size are set when the server starts and are the same for every job
+# as each track finishes, the server replies with the stats of each parameter set on it
+#   {"id":"a", "seed":1, "results":[{...}, {...}]}
+# and once every track has finished, with the summary of each parameter set over all of them
+#   {"id":"a", "done":true, "tracks":3, "seconds":1.2, "summaries":[{...}, {...}]}
+# anything wrong with a job, or a track that fails, is replied to with an "error" instead
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .constants import *
+from .runners import EvaluateFleet, SummariseEvaluation
+from .track import Track
+
+# the keys a job can have
+SERVER_JOB_KEYS = ("id", "seeds", "parameter_sets", "max_frames")
+
+# in each worker process, the tracks it has made, most recently used last, and the settings it makes them with
+WORKER_TRACKS = OrderedDict()
+WORKER_SETTINGS = {}
+
+def InitialiseServerWorker(cache, track_size, max_tracks):
+    WORKER_SETTINGS.update(cache=cache, track_size=track_size or {}, max_tracks=max_tracks)
+
+def GetWorkerTrack(seed):
+    # the track for seed, made (or loaded from the cache) the first time it's asked for and then kept in memory
+    # along with anything worked out for it since, like its distances and footprints
+    if seed in WORKER_TRACKS:
+        WORKER_TRACKS.move_to_end(seed)
+        return WORKER_TRACKS[seed]
+    track = Track(None, None, seed, **WORKER_SETTINGS["track_size"])
+    track.Create(WORKER_SETTINGS["cache"])
+    WORKER_TRACKS[seed] = track
+    while len(WORKER_TRACKS) > WORKER_SETTINGS["max_tracks"]:
+        WORKER_TRACKS.popitem(last=False)
+    return track
+
+def WarmServerWorker(seeds, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH)):
+    # make the tracks a worker is going to be asked for, before any jobs arrive. Returns how many tracks it holds
+    # SciPy is imported even without any seeds, so the first job doesn't wait for it
+    import scipy.interpolate, scipy.ndimage
+    for seed in seeds:
+        track = GetWorkerTrack(seed)
+        track.GetTrackDistances()
+        if collision == "footprint":
+            track.GetFootprintTrackPixels(car_size)
+    return len(WORKER_TRACKS)
+
+def EvaluateServerTrack(seed, parameter_sets, max_frames, collision, car_size):
+    # runs in a worker process
+    return EvaluateFleet(GetWorkerTrack(seed), parameter_sets, max_frames, collision, car_size)
+
+def GetWorkerIndex(seed, worker_count):
+    # each seed always goes to the same worker, so each track is only made once and is kept by the worker that needs it
+    return seed % worker_count
+
+class EvaluationServer():
+    # evaluates jobs (track seeds, controller parameters and a frame limit) on a pool of worker processes that are started once
+    # and keep the tracks they've made, so neither starting up nor making a track is paid for again by each job
+    # each worker has a queue of tracks waiting for it. When a queue is full, the server stops reading jobs from that connection
+    # until there's room, so a client sending jobs faster than they can be done is held up rather than using up all the memory
+    # max_frames is used for jobs that don't say. collision and car_size are used for every job: each car size needs its own footprints,
+    # which take as much memory as 16 copies of the track whatever the size of the car, so letting jobs pick them would let a worker run out of memory
+    def __init__(self, workers=None, cache=None, track_size=None, max_frames=10000, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH),
+                 queue_size=SERVER_QUEUE_SIZE, worker_tracks=SERVER_WORKER_TRACKS):
+        self.worker_count = workers or os.cpu_count()
+        self.cache = cache
+        self.track_size = track_size or {}
+        self.max_frames = max_frames
+        self.collision = collision
+        self.car_size = tuple(car_size)
+        self.queue_size = queue_size
+        self.worker_tracks = worker_tracks
+        self.executors = []
+        self.queues = []
+        self.worker_tasks = []
+        # the writer of each open connection, by the task handling it, and every job that's being streamed back
+        self.connections = {}
+        self.job_tasks = set()
+        self.server = None
+        self.job_count = 0
+
+    async def Start(self, host=SERVER_HOST, port=SERVER_PORT, warm_seeds=()):
+        # start the worker processes, make warm_seeds' tracks in the workers that will be asked for them, then start listening
+        # each worker process gets its own executor, so the tracks for a seed are always sent to the same process
+        for _ in range(self.worker_count):
+            self.executors.append(self.CreateExecutor())
+            self.queues.append(asyncio.Queue(self.queue_size))
+
+        loop = asyncio.get_running_loop()
+        worker_seeds = [[] for _ in range(self.worker_count)]
+        for seed in warm_seeds:
+            worker_seeds[GetWorkerIndex(seed, self.worker_count)].append(seed)
+        await asyncio.gather(*(loop.run_in_executor(executor, WarmServerWorker, seeds, self.collision, self.car_size)
+                               for executor, seeds in zip(self.executors, worker_seeds)))
+
+        # two tasks for each worker, so the next track is already waiting in the worker process when one finishes
+        for worker in range(self.worker_count):
+            for _ in range(2):
+                self.worker_tasks.append(asyncio.create_task(self.RunWorker(worker)))
+        self.server = await asyncio.start_server(self.HandleConnection, host, port, limit=SERVER_MAX_LINE_BYTES)
+
+    async def Serve(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def Close(self):
+        # stop listening, then end every connection before stopping the workers
+        if self.server is not None:
+            self.server.close()
+        for writer in self.connections.values():
+            writer.close()
+        for task in self.job_tasks:
+            task.cancel()
+        if self.job_tasks:
+            await asyncio.wait(self.job_tasks)
+        while self.connections:
+            # a connection waiting for room on a full queue carries on once there is room, and then finds its jobs were cancelled
+            for queue in self.queues:
+                while not queue.empty():
+                    queue.get_nowait()[0].cancel()
+            await asyncio.wait(list(self.connections), timeout=0.1)
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        for executor in self.executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def GetPort(self):
+        # the port the server is listening on, e.g. when it was started on port 0 to pick any free port
+        return self.server.sockets[0].getsockname()[1]
+
+    async def RunWorker(self, worker):
+        # take tracks off the worker's queue and evaluate them in its process, one at a time
+        # if the process dies (e.g. it's killed, or runs out of memory) it's started again and the track is tried once more
+        loop = asyncio.get_running_loop()
+        while True:
+            future, arguments = await self.queues[worker].get()
+            # the client may have gone while the track was waiting
+            if future.cancelled():
+                continue
+            for attempt in range(2):
+                executor = self.executors[worker]
+                try:
+                    results = await loop.run_in_executor(executor, EvaluateServerTrack, *arguments)
+                except BrokenProcessPool as error:
+                    self.RestartWorker(worker, executor)
+                    if attempt == 0 and not future.done():
+                        continue
+                    if not future.done():
+                        future.set_exception(error)
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+                else:
+                    if not future.done():
+                        future.set_result(results)
+                break
+
+    def RestartWorker(self, worker, executor):
+        # replace a worker whose process has died. Both of its RunWorker tasks find out, but it's only replaced once
+        if self.executors[worker] is not executor:
+            return
+        print(f"server worker {worker} stopped unexpectedly, starting it again")
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.executors[worker] = self.CreateExecutor()
+
+    def CreateExecutor(self):
+        return ProcessPoolExecutor(max_workers=1, initializer=InitialiseServerWorker, initargs=(self.cache, self.track_size, self.worker_tracks))
+
+    def GetJob(self, message):
+        # check a job and fill in what it left out. Raises ValueError if there's something wrong with it
+        if not isinstance(message, dict):
+            raise ValueError("a job has to be a JSON object")
+        if "collision" in message or "car_size" in message:
+            raise ValueError("collision and car_size are set when the server starts, with --collision and --car-size")
+        unknown_keys = set(message) - set(SERVER_JOB_KEYS)
+        if unknown_keys:
+            raise ValueError(f"unknown job keys {', '.join(sorted(unknown_keys))}, choose from {', '.join(SERVER_JOB_KEYS)}")
+
+        seeds = message.get("seeds")
+        if not isinstance(seeds, list) or not seeds or not all(type(seed) is int and seed >= 0 for seed in seeds):
+            raise ValueError("seeds has to be a list of at least one whole number, 0 or more")
+
+        parameter_sets = message.get("parameter_sets", [{}])
+        if not isinstance(parameter_sets, list) or not parameter_sets or not all(isinstance(parameter_set, dict) for parameter_set in parameter_sets):
+            raise ValueError("parameter_sets has to be a list of at least one object")
+        for parameter_set in parameter_sets:
+            for name, value in parameter_set.items():
+                if name not in CONTROLLER_PARAMETERS:
+                    raise ValueError(f"unknown controller parameter {name}, choose from {', '.join(CONTROLLER_PARAMETERS)}")
+                if type(value) not in (int, float):
+                    raise ValueError(f"the value of {name} has to be a number")
+
+        max_frames = message.get("max_frames", self.max_frames)
+        if type(max_frames) is not int or not 1 <= max_frames <= SERVER_MAX_FRAMES:
+            raise ValueError(f"max_frames has to be a whole number from 1 to {SERVER_MAX_FRAMES}")
+
+        if "id" in message:
+            job_id = message["id"]
+        else:
+            self.job_count += 1
+            job_id = self.job_count
+        return {"id":job_id, "seeds":seeds, "parameter_sets":[{name:float(value) for name, value in parameter_set.items()} for parameter_set in parameter_sets],
+                "max_frames":max_frames}
+
+    async def HandleConnection(self, reader, writer):
+        # read jobs from a client, one per line, and reply to each as its tracks finish
+        # a client can send more jobs while earlier ones are running, and the replies to them can be mixed up, so each has the job's id
+        loop = asyncio.get_running_loop()
+        write_lock = asyncio.Lock()
+        job_tasks = set()
+        self.connections[asyncio.current_task()] = writer
+
+        async def Send(message):
+            async with write_lock:
+                writer.write(json.dumps(message).encode() + b"\n")
+                # waiting for a slow client to read the replies also holds up its jobs
+                await writer.drain()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    await Send({"error":f"jobs can't be longer than {SERVER_MAX_LINE_BYTES} bytes"})
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+
+                message = None
+                try:
+                    message = json.loads(line)
+                    job = self.GetJob(message)
+                except ValueError as error:
+                    await Send({"id":message.get("id") if isinstance(message, dict) else None, "error":str(error)})
+                    continue
+
+                # the results are sent as they come in while the tracks are still being queued
+                futures = {loop.create_future():seed for seed in job["seeds"]}
+                task = asyncio.create_task(self.StreamJob(job, futures, Send))
+                for tasks in (job_tasks, self.job_tasks):
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                # put each track on its worker's queue. If the queue is full this waits, and no more jobs are read until it isn't
+                for future, seed in futures.items():
+                    # StreamJob cancels the tracks that are left if the client has gone
+                    if future.cancelled():
+                        break
+                    await self.queues[GetWorkerIndex(seed, self.worker_count)].put(
+                        (future, (seed, job["parameter_sets"], job["max_frames"], self.collision, self.car_size)))
+
+            # the client has sent everything, but still gets the replies to the jobs it sent (unless the server is closing and cancels them)
+            if job_tasks:
+                await asyncio.wait(job_tasks)
+        except ConnectionError:
+            # the client has gone, so there's nobody to tell
+            pass
+        finally:
+            del self.connections[asyncio.current_task()]
+            for task in job_tasks:
+                task.cancel()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def StreamJob(self, job, futures, Send):
+        # send the results of each track of a job as soon as it finishes, then the summary of every track
+        start = time.perf_counter()
+        results = [[] for _ in job["parameter_sets"]]
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    seed = futures[future]
+                    if future.exception() is not None:
+                        await Send({"id":job["id"], "seed":seed, "error":f"{type(future.exception()).__name__}: {future.exception()}"})
+                        continue
+                    for set_results, result in zip(results, future.result()):
+                        set_results.append(result)
+                    await Send({"id":job["id"], "seed":seed, "results":future.result()})
+
+            await Send({"id":job["id"], "done":True, "tracks":len(results[0]), "seconds":time.perf_counter() - start,
+                        "summaries":[SummariseEvaluation(set_results) for set_results in results]})
+        except ConnectionError:
+            # nobody is left to send the results to, so the tracks still waiting aren't evaluated
+            for future in pending:
+                future.cancel()
+        except asyncio.CancelledError:
+            for future in pending:
+                future.cancel()
+            raise
+
+def RunServer(host=SERVER_HOST, port=SERVER_PORT, workers=None, cache=None, track_size=None, max_frames=10000, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH),
+              warm_seeds=(), queue_size=SERVER_QUEUE_SIZE, worker_tracks=SERVER_WORKER_TRACKS):
+    # run an EvaluationServer until it's stopped with Ctrl+C
+    async def Serve():
+        server = EvaluationServer(workers, cache, track_size, max_frames, collision, car_size, queue_size, worker_tracks)
+        start = time.perf_counter()
+        try:
+            await server.Start(host, port, warm_seeds)
+            print(f"{server.worker_count} workers started with {len(warm_seeds)} tracks in {time.perf_counter() - start:.2f}s, listening on {host}:{server.GetPort()}")
+            await server.Serve()
+        finally:
+            await server.Close()
+
+    try:
+        asyncio.run(Serve())
+    except KeyboardInterrupt:
+        print("server stopped")
+
+async def RequestEvaluation(job, host=SERVER_HOST, port=SERVER_PORT):
+    # send a job to an EvaluationServer and yield each reply to it, finishing with the "done" reply or an error with the whole job
+    reader, writer = await asyncio.open_connection(host, port, limit=SERVER_MAX_LINE_BYTES)
+    try:
+        writer.write(json.dumps(job).encode() + b"\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("the server closed the connection before the job was done")
+            reply = json.loads(line)
+            yield reply
+            if reply.get("done") or ("error" in reply and "seed" not in reply):
+                break
+    finally:
+        writer.close()
+        await writer.wait_closed()
@@ -0,0 +1,117 @@
+# saving every frame of a run to a file, and reading it back, see TelemetryRecorder
+import json
+import os
+import numpy as np
+from .constants import *
+
+def EncodeTelemetryHeader(header):
+    header_json = json.dumps(header).encode()
+    header_size = len(TELEMETRY_MAGIC) + 4 + len(header_json)
+    header_json += b" " * (-header_size % TELEMETRY_ALIGNMENT)
+    return TELEMETRY_MAGIC + len(header_json).to_bytes(4, "little") + header_json
+
+def GetTelemetryPath(directory, track_number, seed):
+    return os.path.join(directory, f"track-{track_number:04d}-seed-{seed}.telemetry")
+
+def GetTelemetryHeader(track, speed_max, collision="point", car_size=(CAR_LENGTH, CAR_WIDTH)):
+    # everything Replay needs to make the track again and draw the cars the same way
+    return {
+        "seed":track.seed,
+        "track size":{"rows":track.rows, "cols":track.cols, "square_size":track.square_size},
+        "periodic widths":track.periodic_widths,
+        "speed max":[float(car_speed_max) for car_speed_max in speed_max],
+        "collision":collision,
+        "car size":list(car_size),
+        }
+
+class TelemetryRecorder():
+    # streams the state of one or more cars to a telemetry file, a frame at a time (see TELEMETRY_MAGIC)
+    # frames are collected in a buffer that is made once and written a chunk at a time. The file is only ever appended to,
+    # so whatever has been written can be read, by TelemetryFile, even if the run never finishes
+    # header is saved in the file, e.g. the track's seed and size so the track can be made again to replay it
+    def __init__(self, path, car_count, header=None, chunk_frames=TELEMETRY_CHUNK_FRAMES):
+        self.path = path
+        self.car_count = car_count
+        self.buffer = np.zeros((chunk_frames, car_count), dtype=TELEMETRY_DTYPE)
+        self.buffered_frames = 0
+        self.frame_count = 0
+        header = {
+            "version":TELEMETRY_VERSION,
+            "cars":car_count,
+            "vision angles":list(CAR_VISION_ANGLES),
+            "dtype":np.lib.format.dtype_to_descr(TELEMETRY_DTYPE),
+            **(header or {})
+            }
+        self.file = open(path, "wb")
+        self.file.write(EncodeTelemetryHeader(header))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Close()
+
+    def Record(self, positions, speeds, directions_radians, steering_radians, track_edge_distances, crashed):
+        # one frame. Each argument has a value (or row, for positions and track_edge_distances) for each car
+        frame = self.buffer[self.buffered_frames]
+        frame["position"] = positions
+        frame["speed"] = speeds
+        frame["direction_radians"] = directions_radians
+        frame["steering_radians"] = steering_radians
+        frame["track_edge_distances"] = track_edge_distances
+        frame["crashed"] = crashed
+        self.buffered_frames += 1
+        self.frame_count += 1
+        if self.buffered_frames == len(self.buffer):
+            self.Flush()
+
+    def RecordCar(self, car):
+        # a car that has crashed didn't look at the track this frame
+        instruction = car.latestInstructions.GetNewest()
+        track_edge_distances = 0 if car.crashed or instruction is None else instruction["track_edge_distances"]
+        self.Record(car.position, car.speed, car.direction_radians, car.steering_radians, track_edge_distances, car.crashed)
+
+    def RecordFleet(self, fleet):
+        track_edge_distances = np.where(fleet.crashed[:, None], 0, fleet.track_edge_distances)
+        self.Record(fleet.positions, fleet.speeds, fleet.directions_radians, fleet.steering_radians, track_edge_distances, fleet.crashed)
+
+    def Flush(self):
+        self.file.write(self.buffer[:self.buffered_frames].tobytes())
+        self.file.flush()
+        self.buffered_frames = 0
+
+    def Close(self):
+        if not self.file.closed:
+            self.Flush()
+            self.file.close()
+
+class TelemetryFile():
+    # a telemetry file written by TelemetryRecorder, memory-mapped so any frame can be read without reading the rest
+    # frames[frame, car] is a TELEMETRY_DTYPE record. A frame that was only partly written is left out
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as telemetry_file:
+            if telemetry_file.read(len(TELEMETRY_MAGIC)) != TELEMETRY_MAGIC:
+                raise ValueError(f"{path} isn't a telemetry file")
+            header_length = int.from_bytes(telemetry_file.read(4), "little")
+            self.header = json.loads(telemetry_file.read(header_length))
+        if self.header["version"] != TELEMETRY_VERSION:
+            raise ValueError(f"{path} is telemetry version {self.header['version']}, not {TELEMETRY_VERSION}")
+
+        # JSON turns the tuples of the dtype into lists
+        self.dtype = np.dtype([tuple(tuple(part) if isinstance(part, list) else part for part in field) for field in self.header["dtype"]])
+        self.car_count = self.header["cars"]
+        offset = len(TELEMETRY_MAGIC) + 4 + header_length
+        frame_count = (os.path.getsize(path) - offset) // (self.dtype.itemsize * self.car_count)
+        if frame_count:
+            self.frames = np.memmap(path, dtype=self.dtype, mode="r", offset=offset, shape=(frame_count, self.car_count))
+        else:
+            self.frames = np.zeros((0, self.car_count), dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def GetCrashFrames(self):
+        # the first frame each car was crashed in, or -1 if it never crashed
+        crashed = self.frames["crashed"]
+        return np.where(crashed.any(axis=0), crashed.argmax(axis=0), -1)
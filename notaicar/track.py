@@ -0,0 +1,520 @@
+# making tracks, following cars round them and caching them on disk
+# SciPy and pygame take a while to import, so they're only imported by the parts of a track that use them
+import hashlib
+import math
+import os
+import random
+import tempfile
+import zipfile
+import numpy as np
+from .constants import *
+from .sensing import GetCarFootprint
+
+# the pixels of a filled circle for each radius that has been used, see GetCircleStencil
+CIRCLE_STENCILS = {}
+
+def GetCircleStencil(radius):
+    # the pixels pygame.draw.circle fills for a circle of this (whole number) radius, as a (2*radius, 2*radius) array of booleans
+    # the centre of the circle is at [radius, radius]. This is the midpoint circle algorithm pygame uses, so the pixels match exactly
+    if radius in CIRCLE_STENCILS:
+        return CIRCLE_STENCILS[radius]
+
+    stencil = np.zeros((2 * radius, 2 * radius), dtype=bool)
+    f = 1 - radius
+    ddf_x = 0
+    ddf_y = -2 * radius
+    x = 0
+    y = radius
+    while x < y:
+        if f >= 0:
+            y -= 1
+            ddf_y += 2
+            f += ddf_y
+        x += 1
+        ddf_x += 2
+        f += ddf_x + 1
+        # each step fills horizontal lines of the circle, offset from the centre
+        if f >= 0:
+            stencil[radius - x:radius + x, radius + y - 1] = True
+            stencil[radius - x:radius + x, radius - y] = True
+        stencil[radius - y:radius + y, radius + x - 1] = True
+        stencil[radius - y:radius + y, radius - x] = True
+
+    CIRCLE_STENCILS[radius] = stencil
+    return stencil
+
+def RasteriseTrack(window, interpolated_scaled_track, track_widths):
+    # the track as an array of booleans, True wherever one of the circles along the centre line covers the pixel
+    # gives exactly the same pixels as drawing each circle with pygame.draw.circle (which truncates the centre and radius to whole numbers)
+    # but doesn't need pygame
+    track_pixels = np.zeros(window, dtype=bool)
+    centres = np.trunc(interpolated_scaled_track).astype(np.intp)
+    radii = np.trunc(track_widths).astype(np.intp)
+
+    for (centre_x, centre_y), radius in zip(centres.tolist(), radii.tolist()):
+        if radius < 1:
+            continue
+        stencil = GetCircleStencil(radius)
+        # clip the circle to the window
+        left = max(centre_x - radius, 0)
+        top = max(centre_y - radius, 0)
+        right = min(centre_x + radius, window[0])
+        bottom = min(centre_y + radius, window[1])
+        if left >= right or top >= bottom:
+            continue
+        track_pixels[left:right, top:bottom] |= stencil[left - centre_x + radius:right - centre_x + radius, top - centre_y + radius:bottom - centre_y + radius]
+
+    return track_pixels
+
+class PackedTrackPixels():
+    # track_pixels packed 8 pixels to a byte, an eighth of the memory, for when lots of tracks are held at once
+    # it can be indexed like track_pixels, with whole numbers or arrays of them, so it can be used in its place by CastRays
+    def __init__(self, track_pixels=None, bits=None, shape=None):
+        if track_pixels is not None:
+            shape = track_pixels.shape
+            bits = np.packbits(track_pixels, axis=1)
+        self.shape = tuple(shape)
+        self.bits = bits
+
+    def __getitem__(self, index):
+        x, y = index
+        y = np.asarray(y)
+        return ((self.bits[x, y >> 3] >> (7 - (y & 7))) & 1).astype(bool)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def Unpack(self):
+        return np.unpackbits(self.bits, axis=1, count=self.shape[1]).astype(bool)
+
+def GetWindowSize(rows=ROWS, cols=COLS, square_size=SQUARE_SIZE):
+    return (cols * square_size, rows * square_size)
+
+class Track():
+    def __init__(self, window, screen, seed=None, rows=ROWS, cols=COLS, square_size=SQUARE_SIZE, periodic_widths=TRACK_PERIODIC_WIDTHS) -> None:
+        # the track is made on a grid of rows x cols squares, each square_size pixels
+        if rows < TRACK_GRID_MIN or cols < TRACK_GRID_MIN:
+            raise ValueError(f"a track needs a grid of at least {TRACK_GRID_MIN} rows and {TRACK_GRID_MIN} columns, not {rows} x {cols}")
+        self.rows = rows
+        self.cols = cols
+        self.square_size = square_size
+        self.curve_points = rows * cols * square_size // 5
+        # whether the width at the end of the track matches the start, see SetTrackWidths
+        self.periodic_widths = periodic_widths
+        # without a window size, the track fills a window that is exactly the size of the grid
+        if window is None:
+            window = GetWindowSize(rows, cols, square_size)
+        self.window = window
+        self.screen = screen
+        # every track has a seed, so it can always be made again. Without one, a random seed is picked
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.np_random = np.random.default_rng(seed)
+        self.track = []
+        self.scaled_track = []
+        self.interpolated_scaled_track = np.zeros((0, 2))
+        self.track_widths = np.zeros(0)
+        self.track_pixels = []
+        self.track_distances = None
+        self.centre_line = np.zeros((0, 2))
+        self.centre_line_distances = np.zeros(0)
+        self.track_length = 0.0
+        self.centre_line_tree = None
+        # see GetFootprintTrackPixels, keyed by car size
+        self.footprint_track_pixels = {}
+    
+    def Create(self, cache=None):
+        # if the track is in the cache, everything up to and including track_pixels is loaded rather than generated
+        if cache is not None and cache.Load(self):
+            self.SetScaledTrack()
+        else:
+            self.GetNewTrack()
+            self.SetScaledTrack()
+            self.SetInterpolatedScaledTrack()
+            self.SetTrackWidths()
+            self.SetTrackPixels()
+            if cache is not None:
+                cache.Save(self)
+        self.SetCentreLine()
+        # a track without a screen is headless and is never drawn
+        if self.screen is not None:
+            self.DrawInterpolatedTrack()
+        #self.DrawTrack()
+        
+    def GetNewTrack(self):
+        # python version of the answer to this 
+        # https://answers.unity.com/questions/394991/generate-closed-random-path-in-c.html
+        
+        start_row = self.random.randint(1, self.cols-2)
+        start_col = self.random.randint(1, self.rows-2)
+        
+        # the coordinates of 4 central points that make up a square
+        # the track is a ring of vertices, each pointing to the next one round, so new vertices can be added anywhere without moving the rest
+        # each track segment is known by the vertex it starts at
+        track_start = (start_row,start_col)
+        next_vertex = {
+            (start_row,start_col):(start_row+1,start_col),
+            (start_row+1,start_col):(start_row+1,start_col+1),
+            (start_row+1,start_col+1):(start_row,start_col+1),
+            (start_row,start_col+1):(start_row,start_col)
+            }
+        
+        # create 2D array of booleans for the vertices in the grid
+        # Elements will be set to True to indicate the vertex is part of the track and so the track can't be expanded into it
+        # Elements around the outside are also set to True, so that the track won't expand all the way to the edge
+        grid_vertices = np.zeros((self.cols+1,self.rows+1), dtype=bool)
+        grid_vertices[:, 0] = True
+        grid_vertices[:, self.rows] = True
+        grid_vertices[0, :] = True
+        grid_vertices[self.cols, :] = True
+
+        # set the grid vertices for the starting square of track
+        for track_vertex in next_vertex:
+            grid_vertices[track_vertex] = True
+
+        # the segments that can currently be expanded, kept in a list so one can be picked at random
+        # and a dict of where each is in the list, so it can be removed without searching for it
+        expandable_segments = []
+        expandable_segment_indices = {}
+        # the 2 vertices each segment would expand into and, the other way round, the segments that would expand into each vertex
+        segment_expansions = {}
+        vertex_segments = {}
+
+        def SetExpandable(segment_start, expandable):
+            if expandable and segment_start not in expandable_segment_indices:
+                expandable_segment_indices[segment_start] = len(expandable_segments)
+                expandable_segments.append(segment_start)
+            elif not expandable and segment_start in expandable_segment_indices:
+                # move the last segment in the list into the gap
+                index = expandable_segment_indices.pop(segment_start)
+                last_segment = expandable_segments.pop()
+                if last_segment != segment_start:
+                    expandable_segments[index] = last_segment
+                    expandable_segment_indices[last_segment] = index
+
+        def AddSegment(segment_start):
+            segment_start_x, segment_start_y = segment_start
+            segment_end_x, segment_end_y = next_vertex[segment_start]
+
+            # the track started off going round clockwise and so always will
+            # the track should expand outwards, which is always to the left of the current track segment (when looking from the start of the segment to the end of it)
+            # coordinates start (0,0) at the top left
+            # if the segment goes left to right, it will expand upwards and y will decrease by 1
+            # if the segment goes up to down, it will expand to the right and x will increase by 1
+            # if the segment goes right to left, it will expand downwards and y will increase by 1
+            # if the segment goes down to up, it will expand to the left and x wil decrease by 1
+            delta_x = segment_end_y - segment_start_y
+            delta_y = segment_start_x - segment_end_x
+            track_vertex_extra_1 = (segment_start_x + delta_x, segment_start_y + delta_y)
+            track_vertex_extra_2 = (segment_end_x + delta_x, segment_end_y + delta_y)
+
+            segment_expansions[segment_start] = (track_vertex_extra_1, track_vertex_extra_2)
+            vertex_segments.setdefault(track_vertex_extra_1, set()).add(segment_start)
+            vertex_segments.setdefault(track_vertex_extra_2, set()).add(segment_start)
+            # a segment can only be expanded if neither new vertex is already in use
+            SetExpandable(segment_start, not grid_vertices[track_vertex_extra_1] and not grid_vertices[track_vertex_extra_2])
+
+        def RemoveSegment(segment_start):
+            for track_vertex_extra in segment_expansions.pop(segment_start):
+                vertex_segments[track_vertex_extra].discard(segment_start)
+            SetExpandable(segment_start, False)
+
+        for segment_start in next_vertex:
+            AddSegment(segment_start)
+
+        # keep expanding the track until it won't expand any more
+        # picking any of the expandable segments at random gives the same tracks as trying every segment in a random order until one expands
+        while expandable_segments:
+            segment_start = expandable_segments[self.random.randrange(len(expandable_segments))]
+            segment_end = next_vertex[segment_start]
+            track_vertex_extra_1, track_vertex_extra_2 = segment_expansions[segment_start]
+
+            # insert the new vertices between the start and end of the segment
+            RemoveSegment(segment_start)
+            next_vertex[segment_start] = track_vertex_extra_1
+            next_vertex[track_vertex_extra_1] = track_vertex_extra_2
+            next_vertex[track_vertex_extra_2] = segment_end
+            # expanding the segment that closes the ring puts the new vertices at the start of the track
+            if segment_end == track_start:
+                track_start = track_vertex_extra_1
+
+            # flag that the new vertices are part of the track, so no other segment can expand into them
+            # only the segments that would have expanded into them are affected
+            grid_vertices[track_vertex_extra_1] = True
+            grid_vertices[track_vertex_extra_2] = True
+            for track_vertex_extra in (track_vertex_extra_1, track_vertex_extra_2):
+                for affected_segment_start in vertex_segments.get(track_vertex_extra, ()):
+                    SetExpandable(affected_segment_start, False)
+
+            AddSegment(segment_start)
+            AddSegment(track_vertex_extra_1)
+            AddSegment(track_vertex_extra_2)
+
+        # follow the ring round from the start to get the list of vertices
+        track = [track_start]
+        track_vertex = next_vertex[track_start]
+        while track_vertex != track_start:
+            track.append(track_vertex)
+            track_vertex = next_vertex[track_vertex]
+        
+        self.track = track
+
+    def SetScaledTrack(self):    
+        self.scaled_track = [[t[0] * self.square_size,t[1] * self.square_size] for t in self.track]
+
+    def DrawTrackStart(self):
+        import pygame
+        pygame.draw.circle(self.screen, START_COLOUR, self.scaled_track[0], TRACK_MAX_WIDTH + 5)
+
+    def DrawTrack(self):
+        import pygame
+        pygame.draw.lines(self.screen, BLACK, True, self.scaled_track, 1)
+
+    def SetInterpolatedScaledTrack(self):
+        # https://stackoverflow.com/questions/31464345/fitting-a-closed-curve-to-a-set-of-points
+        
+        # loop the track back round to the strart, as a numpy array of coordinates
+        pts = np.array(self.scaled_track + [self.scaled_track[0]], dtype=float)
+
+        # magic happens
+        from scipy.interpolate import splprep, splev
+        tck, u = splprep(pts.T, u=None, s=0.0, per=1) 
+        u_new = np.linspace(u.min(), u.max(), self.curve_points)
+        x_new, y_new = splev(u_new, tck, der=0)
+
+        # kept as an (n,2) array, which is what rasterising, the centre line and the cache all use
+        self.interpolated_scaled_track = np.column_stack((x_new, y_new))
+
+    def SetTrackWidths(self):
+        # track width should vary between TRACK_MIN_WIDTH to TRACK_MAX_WIDTH
+        # to get the width to vary smoothly but randomly, a random walk is created and then smoothed over 20 points, normalised to the range [0,1] and scaled
+        # the walk is the running total of a step for every point, all drawn at once
+        # the width starts at TRACK_MIN_WIDTH. If the end of the track is wide, it can cause problems with driving when it loops round to the narrow start.
+        # With periodic_widths, the walk is made to end where it started and is smoothed round the join, so the end is the same width as the start,
+        # but by default it isn't, as this makes for an extra challenge.
+        steps = self.np_random.normal(scale=1, size=self.curve_points)
+
+        from scipy.ndimage import uniform_filter1d
+        if self.periodic_widths:
+            # the last point of the centre line is the same as the first, so the walk loops round the points before it
+            random_walk = np.concatenate(([0.0], np.cumsum(steps[:-2] - steps[:-1].mean())))
+            track_width = uniform_filter1d(random_walk, size=20, mode="wrap")
+            track_width = np.append(track_width, track_width[0])
+        else:
+            random_walk = np.concatenate(([0.0], np.cumsum(steps[:-1])))
+            track_width = uniform_filter1d(random_walk, size=20)
+
+        track_width = (TRACK_MAX_WIDTH - TRACK_MIN_WIDTH) * ((track_width - track_width.min()) / (track_width.max() - track_width.min())) + TRACK_MIN_WIDTH
+        self.track_widths = track_width
+    
+    def SetTrackPixels(self):
+        # the track is made of lots of circles along the centre line, one for each width
+        self.track_pixels = RasteriseTrack(self.window, self.interpolated_scaled_track, self.track_widths)
+
+    def GetPackedTrackPixels(self):
+        return PackedTrackPixels(self.track_pixels)
+
+    def SetTrackDistances(self):
+        # for every pixel, the straight-line distance to the nearest pixel that isn't track (0 off the track)
+        # worked out once, so vision rays can be sphere traced and clearance from the edge is a single lookup
+        from scipy.ndimage import distance_transform_edt
+        self.track_distances = distance_transform_edt(self.track_pixels).astype(np.float32)
+
+    def GetTrackDistances(self):
+        # only Fleet and GetEdgeClearance need the distances, so they're worked out the first time they're needed
+        if self.track_distances is None:
+            self.SetTrackDistances()
+        return self.track_distances
+
+    def SetCentreLine(self):
+        # the centre line as an array and how far along the track each point of it is
+        # the last point of interpolated_scaled_track is the same as the first, so it's left out
+        self.centre_line = self.interpolated_scaled_track[:-1]
+        segment_lengths = np.hypot(*(np.roll(self.centre_line, -1, axis=0) - self.centre_line).T)
+        self.centre_line_distances = np.concatenate(([0.0], np.cumsum(segment_lengths[:-1])))
+        self.track_length = float(segment_lengths.sum())
+        self.centre_line_tree = None
+
+    def GetNearestCentreLineIndices(self, positions):
+        # the index of the nearest point of centre_line to each of an (n,2) array of positions
+        # found with a KD-tree, which is only made the first time it's needed as LapCounter can usually do without
+        if self.centre_line_tree is None:
+            from scipy.spatial import cKDTree
+            self.centre_line_tree = cKDTree(self.centre_line)
+        _, indices = self.centre_line_tree.query(np.asarray(positions, dtype=float).reshape(-1, 2))
+        return indices
+
+    def GetProgress(self, positions):
+        # how far round the track from the start each position is, as a fraction of the length of the track
+        return self.centre_line_distances[self.GetNearestCentreLineIndices(positions)] / self.track_length
+
+    def GetFootprintTrackPixels(self, car_size=(CAR_LENGTH, CAR_WIDTH)):
+        # for each of CAR_FOOTPRINT_HEADINGS, the track eroded by the footprint of a car_size (length, width) car at that heading:
+        # True where the whole car fits on the track with its middle on that pixel, so checking for a crash is still one lookup
+        # it takes a while, so it's only worked out the first time it's needed. Each erosion counts the off-track pixels under the
+        # footprint at every position, by convolving with a Fourier transform of the track that is only done once
+        car_size = tuple(car_size)
+        if car_size not in self.footprint_track_pixels:
+            width, height = self.track_pixels.shape
+            footprint_size = GetCarFootprint(0, *car_size).shape[0]
+            half_size = footprint_size // 2
+            from scipy.fft import rfft2, irfft2, next_fast_len
+            fft_shape = (next_fast_len(width + footprint_size - 1), next_fast_len(height + footprint_size - 1))
+            off_track_fft = rfft2((~self.track_pixels).astype(np.float32), s=fft_shape, workers=-1)
+
+            footprint_track_pixels = np.empty((CAR_FOOTPRINT_HEADINGS, width, height), dtype=bool)
+            for heading in range(CAR_FOOTPRINT_HEADINGS):
+                footprint = GetCarFootprint(heading * math.pi / CAR_FOOTPRINT_HEADINGS, *car_size)
+                off_track_counts = irfft2(off_track_fft * rfft2(footprint.astype(np.float32), s=fft_shape, workers=-1), s=fft_shape, workers=-1)
+                footprint_track_pixels[heading] = off_track_counts[half_size:half_size + width, half_size:half_size + height] < 0.5
+            self.footprint_track_pixels[car_size] = footprint_track_pixels
+        return self.footprint_track_pixels[car_size]
+
+    def GetEdgeClearance(self, position):
+        # how far a position is from the edge of the track, in pixels. 0 means it's off the track
+        return float(self.GetTrackDistances()[round(position[0]), round(position[1])])
+
+    def DrawInterpolatedTrack(self):
+        # now make the track look nice
+        self.screen.fill(WHITE)
+
+        self.DrawTrackStart()
+
+        # colour in track_pixels, which are the same lots of circles of varying widths that make a smooth track
+        import pygame
+        screen_pixels = pygame.surfarray.pixels3d(self.screen)
+        screen_pixels[self.track_pixels] = BLACK
+        # the screen stays locked until the pixel array has gone
+        del screen_pixels
+            
+        # draw track centre line
+        #for t in self.scaled_track:
+        #    self.screen.set_at((round(t[0]),round(t[1])), TRACK_MIDLINE_COLOUR)
+
+    def GetInitialDirectionRadians(self):
+        initial_angle = math.atan2(self.track[1][1]-self.track[0][1], self.track[1][0]-self.track[0][0])
+        return initial_angle
+
+class LapCounter():
+    # follows how far round the track each of a batch of cars has got, including how many laps they've done
+    # the progress of each car is the fraction of the track it's nearest to, added up frame by frame,
+    # so going past the start counts as carrying on round rather than going back to 0
+    # cars don't go far in a frame, so the nearest point of the centre line is first looked for close to where it was last frame.
+    # Only a car that has gone further than that is looked up in the track's KD-tree
+    def __init__(self, track, size=1):
+        self.track = track
+        # every car starts at the start of the track
+        self.indices = np.zeros(size, dtype=np.intp)
+        self.fractions = np.zeros(size)
+        # laps driven, e.g. 1.25 is a lap and a quarter. Can go down if a car goes the wrong way
+        self.progress = np.zeros(size)
+
+    def Update(self, positions, cars=None):
+        # positions are the (n,2) positions of the cars with indices cars, or of every car if cars is None
+        if cars is None:
+            cars = slice(None)
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        centre_line = self.track.centre_line
+
+        candidates = (self.indices[cars, None] + LAP_COUNTER_SEARCH_OFFSETS) % len(centre_line)
+        offsets = centre_line[candidates] - positions[:, None, :]
+        nearest = np.einsum("ijk,ijk->ij", offsets, offsets).argmin(axis=1)
+        indices = candidates[np.arange(len(candidates)), nearest]
+        # if the nearest point is at the end of the search, the car may have gone further, so use the KD-tree
+        lost = (nearest == 0) | (nearest == len(LAP_COUNTER_SEARCH_OFFSETS) - 1)
+        if lost.any():
+            indices[lost] = self.track.GetNearestCentreLineIndices(positions[lost])
+
+        fractions = self.track.centre_line_distances[indices] / self.track.track_length
+        # a car can't get half way round the track in one frame, so a bigger change means it went past the start
+        self.progress[cars] += (fractions - self.fractions[cars] + 0.5) % 1 - 0.5
+        self.fractions[cars] = fractions
+        self.indices[cars] = indices
+
+    def GetLaps(self):
+        return np.floor(self.progress).astype(int)
+
+class TrackCache():
+    # tracks saved to disk, so a track that has been generated before can be loaded instead
+    # a track is saved under its seed and every setting that changes what it looks like
+    # each track is one .npz file. When the files add up to more than max_bytes, the least recently used are deleted
+    def __init__(self, directory, max_bytes=TRACK_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.Evict()
+
+    def GetPath(self, track):
+        key = (TRACK_CACHE_VERSION, track.seed, track.cols, track.rows, track.square_size, TRACK_MIN_WIDTH, TRACK_MAX_WIDTH, track.curve_points, track.periodic_widths)
+        key_hash = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"track-{key_hash}.npz")
+
+    def Load(self, track):
+        # fill in the track from the cache. Returns False if it isn't there
+        path = self.GetPath(track)
+        try:
+            with np.load(path) as cached:
+                track.track = [tuple(vertex) for vertex in cached["track"].tolist()]
+                track.interpolated_scaled_track = cached["interpolated_scaled_track"]
+                track.track_widths = cached["track_widths"]
+                track.track_pixels = PackedTrackPixels(bits=cached["track_pixels"], shape=cached["track_pixels_shape"]).Unpack()
+        except FileNotFoundError:
+            return False
+        except (KeyError, ValueError, OSError, EOFError, zipfile.BadZipFile):
+            # a damaged file, e.g. from a disk that filled up. Delete it, so the track is made again and saved properly
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return False
+        # touch the file, so it counts as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # another process evicted it after it was loaded, which doesn't matter as the track has been loaded
+            pass
+        return True
+
+    def Save(self, track):
+        path = self.GetPath(track)
+        # write to a temporary file and rename it, so other processes never see half a file
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as temporary_file:
+                np.savez(temporary_file,
+                         track=np.array(track.track),
+                         interpolated_scaled_track=track.interpolated_scaled_track,
+                         track_widths=track.track_widths,
+                         track_pixels=track.GetPackedTrackPixels().bits,
+                         track_pixels_shape=np.array(track.track_pixels.shape))
+            os.replace(temporary_path, path)
+        except BaseException:
+            # Evict only counts .npz files, so a temporary file left behind would never be deleted
+            os.remove(temporary_path)
+            raise
+        self.Evict()
+
+    def Evict(self):
+        # delete the least recently used tracks until the cache fits in max_bytes
+        cached_files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                cached_files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in cached_files)
+        for _, size, path in sorted(cached_files):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # another process got there first
+                pass
+            total_bytes -= size